@@ -0,0 +1,168 @@
+import os
+import random
+import time
+import timeit
+import utils
+from utils import BACKENDS, CURVES, Coor, EllipticCurve, PrimeField, get_backend
+
+a, b, p, G, n, _ = CURVES['P-224']
+
+ROUNDS = 100
+XOR_SIZES = [('1 KB', 1024), ('1 MB', 1024 ** 2), ('100 MB', 100 * 1024 ** 2)]
+# the per byte loop is skipped above this size, it would take minutes
+XOR_LOOP_LIMIT = 1024 ** 2
+
+
+class CountingEllipticCurve(EllipticCurve):
+    """ counts jacobian group operations """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.doublings = 0
+        self.additions = 0
+
+    def reset_counters(self):
+        self.doublings = 0
+        self.additions = 0
+
+    def jacobian_doubling(self, P: tuple):
+        self.doublings += 1
+        return super().jacobian_doubling(P)
+
+    def jacobian_addition(self, P: tuple, Q: tuple):
+        self.additions += 1
+        return super().jacobian_addition(P, Q)
+
+    def jacobian_mixed_addition(self, P: tuple, Q: Coor):
+        self.additions += 1
+        return super().jacobian_mixed_addition(P, Q)
+
+
+def measure(curve: CountingEllipticCurve, multiply, scalars, P: Coor):
+    curve.reset_counters()
+    start = time.perf_counter()
+    for k in scalars:
+        multiply(k, P)
+    elapsed = time.perf_counter() - start
+    n = len(scalars)
+    return curve.doublings / n, curve.additions / n, elapsed / n * 1000
+
+
+def bench_variable_base(rounds: int = ROUNDS, backend: str = None):
+    curve = CountingEllipticCurve(a, b, p, G, backend=backend)
+    P = curve.scalar_multiplication(random.randint(1, p - 1), G)
+    scalars = [random.randint(1, p - 1) for _ in range(rounds)]
+
+    print(f"P-224 variable base multiplication, {rounds} random scalars, {curve.backend.name} backend")
+    print(f"{'method':<16}{'doublings':>12}{'additions':>12}{'ms/op':>10}")
+
+    def double_and_add(k, Q):
+        return curve.from_jacobian(curve._jacobian_double_and_add(k, Q))
+
+    results = [('double-and-add', measure(curve, double_and_add, scalars, P))]
+    for width in range(2, 8):
+        results.append((f'wNAF w={width}', measure(
+            curve, lambda k, Q: curve.wnaf_multiplication(k, Q, width), scalars, P)))
+
+    # the ladder performs one differential addition and one doubling per scalar bit
+    start = time.perf_counter()
+    for k in scalars:
+        curve.x_only_scalar_multiplication(k, P)
+    ladder_ms = (time.perf_counter() - start) / len(scalars) * 1000
+    ladder_steps = sum(k.bit_length() - 1 for k in scalars) / len(scalars)
+    results.append(('x-only ladder', (ladder_steps + 1, ladder_steps, ladder_ms)))
+
+    for name, (doublings, additions, ms) in results:
+        print(f"{name:<16}{doublings:>12.1f}{additions:>12.1f}{ms:>10.3f}")
+
+
+def xor_bytes_loop(data: bytes, keystream: bytes):
+    # the per byte loop encrypt/decrypt used before xor_bytes
+    result = bytearray()
+    for i in range(len(data)):
+        result.append(data[i] ^ keystream[i])
+    return bytes(result)
+
+
+def throughput(xor, data: bytes, keystream: bytes):
+    start = time.perf_counter()
+    rounds = 0
+    while True:
+        xor(data, keystream)
+        rounds += 1
+        elapsed = time.perf_counter() - start
+        if elapsed > 0.5:
+            break
+    return len(data) * rounds / elapsed / 1024 ** 2
+
+
+def bench_xor():
+    methods = [('per byte loop', xor_bytes_loop), ('big integer', utils._xor_bytes_int)]
+    if utils.np is not None:
+        methods.append(('numpy', utils._xor_bytes_numpy))
+
+    print("keystream XOR throughput, MB/s")
+    print(f"{'size':<10}" + ''.join(f"{name:>16}" for name, _ in methods))
+    for label, size in XOR_SIZES:
+        data = os.urandom(size)
+        keystream = utils.repeat_key(os.urandom(32), size)
+        row = f"{label:<10}"
+        for name, xor in methods:
+            if xor is xor_bytes_loop and size > XOR_LOOP_LIMIT:
+                row += f"{'-':>16}"
+                continue
+            row += f"{throughput(xor, data, keystream):>16.1f}"
+        print(row)
+
+
+P224_MASK = 2 ** 224 - 1
+
+
+def solinas_reduce(x: int):
+    # P-224 p = 2^224 - 2^96 + 1 and 2^224 = 2^96 - 1 (mod p): fold the high part back into the low 224 bits,
+    # valid for 0 <= x < p^2. measured slower than the builtin % in CPython, so PrimeField keeps using %
+    hi = x >> 224
+    x = (x & P224_MASK) + (hi << 96) - hi
+    hi = x >> 224
+    x = (x & P224_MASK) + (hi << 96) - hi
+    if x >= p:
+        x -= p
+    return x
+
+
+def per_op_ns(statement, namespace: dict, number: int = 100000):
+    return min(timeit.repeat(statement, globals=namespace, number=number, repeat=5)) / number * 1e9
+
+
+def bench_field(backend: str = None):
+    backend = get_backend(backend)
+    F = PrimeField(p, backend)
+    x, y = backend.mpz(random.randint(1, p - 1)), backend.mpz(random.randint(1, p - 1))
+    square = x * x
+    operations = [
+        ('reduce', 'F.reduce(product)'),
+        ('mul', 'F.mul(x, y)'),
+        ('sqr', 'F.sqr(x)'),
+        ('inv', 'F.inv(x)'),
+        ('sqrt', 'F.sqrt(square)'),
+    ]
+
+    print(f"P-224 field operations, ns/op, {backend.name} backend")
+    for name, statement in operations:
+        number = 100 if name == 'sqrt' else 1000 if name == 'inv' else 100000
+        ns = per_op_ns(statement, dict(F=F, x=x, y=y, product=x * y, square=square), number)
+        print(f"{name:<16}{ns:>12.0f}")
+    product = int(x * y)
+    assert solinas_reduce(product) == product % p
+    ns = per_op_ns('solinas_reduce(product)', dict(solinas_reduce=solinas_reduce, product=product))
+    print(f"{'solinas_reduce':<16}{ns:>12.0f}")
+
+
+if __name__ == '__main__':
+    for name in BACKENDS:
+        bench_variable_base(backend=name)
+        print()
+    bench_xor()
+    for name in BACKENDS:
+        print()
+        bench_field(backend=name)
@@ -1,22 +1,13 @@
 import base64
-import pickle
 import sys
 from PyQt5 import QtGui
 from PyQt5.QtWidgets import (
     QGridLayout, QVBoxLayout, QHBoxLayout,
     QApplication, QWidget, QPushButton, QTextEdit, QLabel, QTabWidget, QLineEdit, QCheckBox, QMessageBox,
 )
-from utils import Coor, EllipticCurve
+from utils import EllipticCurve, get_curve
 
-p = 26959946667150639794667015087019630673557916260026308143510066298881
-a = -3
-b = 18958286285566608000408668544493926415504680968679321075787234672564
-
-Gx = 19277929113566293071110308034699488026831934219452440156649784352033
-Gy = 19926808758034470970197974370888749184205991990603949537637343198772
-G = Coor(Gx, Gy)
-
-P224 = EllipticCurve(a, b, p, G)
+P224 = get_curve('P-224', shared_secret_cache_size=EllipticCurve.SHARED_SECRET_CACHE_SIZE)
 
 
 class EllipticCurveWidget(QWidget):
@@ -127,8 +118,8 @@ class EllipticCurveWidget(QWidget):
     def generate_private_key_clicked(self):
         self.sender_private_key = P224.generate_random_n()
         self.sender_private_key_line_edit.setText(str(self.sender_private_key))
-        self.sender_public_key = P224.scalar_multiplication(self.sender_private_key, G)
-        self.sender_public_key_line_edit.setText(self.dump_bytes_pickle(self.sender_public_key))
+        self.sender_public_key = P224.scalar_multiplication(self.sender_private_key, P224.base_point)
+        self.sender_public_key_line_edit.setText(self.dump_point(self.sender_public_key))
         self.keys_generated = True
 
     def _construct_key_entry(self):
@@ -146,11 +137,11 @@ class EllipticCurveWidget(QWidget):
 
         self.cipher_key_layout.addLayout(buttons_horizontal_layout)
 
-    def dump_bytes_pickle(self, t):
-        return self.to_base64(pickle.dumps(t))
+    def dump_point(self, t):
+        return self.to_base64(P224.encode_point(t))
 
-    def load_bytes_pickle(self, t):
-        return pickle.loads(self.from_base64(t))
+    def load_point(self, t):
+        return P224.decode_point(self.from_base64(t))
 
     def to_base64(self, t):
         return base64.b64encode(t).decode()
@@ -167,7 +158,15 @@ class EllipticCurveWidget(QWidget):
         if not pubkey:
             self.show_message_box("Receiver pubkey is empty", "Please enter public key of the receiver")
             return
-        self.recipient_public_key = pickle.loads(self.from_base64(pubkey))
+        try:
+            self.recipient_public_key = self.load_point(pubkey)
+        except ValueError as err:
+            self.show_message_box("Invalid receiver pubkey", str(err))
+            return
+        if self.recipient_public_key is None:
+            # SEC1 b'\x00' decodes to the point at infinity, there is no shared secret with it
+            self.show_message_box("Invalid receiver pubkey", "public key is the point at infinity")
+            return
 
         use_shared_key = self.shared_key
         if self.new_shared_key_on_encryption:
@@ -175,7 +174,7 @@ class EllipticCurveWidget(QWidget):
 
         encryption_point, encrypted_message = P224.encrypt(plain_text, self.recipient_public_key, use_shared_key)
         self.shared_key = encryption_point
-        self.sender_shared_key_line_edit.setText(self.dump_bytes_pickle(encryption_point))
+        self.sender_shared_key_line_edit.setText(self.dump_point(encryption_point))
         self.cipher_text_text_edit.setText(encrypted_message)
 
     def decrypt_button_clicked(self):
@@ -188,7 +187,7 @@ class EllipticCurveWidget(QWidget):
             return
         try:
             cipher_text = self.cipher_text_text_edit.toPlainText()
-            encryption_point = self.load_bytes_pickle(shared_key)
+            encryption_point = self.load_point(shared_key)
             decrypted_message = P224.decrypt(cipher_text, self.sender_private_key, encryption_point)
             self.plain_text_text_edit.setText(decrypted_message)
         except:
@@ -1,33 +1,572 @@
 import collections
+import contextlib
+import functools
+import mmap
+import os
 import random
+import secrets
 import hashlib
 import base64
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Union
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
 
 Coor = collections.namedtuple("Coor", ["x", "y"])
 
+# point at infinity in jacobian coordinates
+JACOBIAN_INFINITY = (1, 1, 0)
+
+# bytes read per step by encrypt_stream/decrypt_stream
+STREAM_CHUNK_SIZE = 48 * 1024
+
+# first byte of encrypt_envelope output
+ENVELOPE_VERSION = 1
+
+# messages per task sent to a worker by encrypt_many/decrypt_many
+BULK_CHUNK_SIZE = 64
+
+# on-disk fixed-base tables: magic, format version, window width, rows, coordinate size,
+# sha256 of the curve parameters and sha256 of the entries that follow the header
+TABLE_CACHE_MAGIC = b'ECPT'
+TABLE_CACHE_VERSION = 1
+TABLE_CACHE_HEADER = struct.Struct('>4sHHHH32s32s')
+DEFAULT_TABLE_CACHE_DIR = os.environ.get(
+    'ELLIPTIC_CURVE_TABLE_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'python-crypto'))
+
+
+def _xor_bytes_int(data: bytes, keystream: bytes):
+    # a single big integer XOR instead of a python loop over the bytes
+    return (int.from_bytes(data, 'big') ^ int.from_bytes(keystream, 'big')).to_bytes(len(data), 'big')
+
+
+def _xor_bytes_numpy(data: bytes, keystream: bytes):
+    return np.bitwise_xor(np.frombuffer(data, dtype=np.uint8), np.frombuffer(keystream, dtype=np.uint8)).tobytes()
+
+
+# XOR two bytes-like objects of the same length, numpy is used when it is installed
+xor_bytes = _xor_bytes_numpy if np is not None else _xor_bytes_int
+
+
+def repeat_key(key: bytes, length: int):
+    return (key * (length // len(key) + 1))[:length]
+
+
+def _fermat_invert(x, p):
+    # fermat corollary theorem
+    return pow(x, p - 2, p)
+
+
+# big integer implementation used by the curve arithmetic
+# mpz converts an int to the backend type, powmod(x, e, p) and invert(x, p) work on that type
+Backend = collections.namedtuple("Backend", ["name", "mpz", "powmod", "invert"])
+
+INT_BACKEND = Backend('int', int, pow, _fermat_invert)
+BACKENDS = {'int': INT_BACKEND}
+if gmpy2 is not None:
+    BACKENDS['gmpy2'] = Backend('gmpy2', gmpy2.mpz, gmpy2.powmod, gmpy2.invert)
+
+
+def get_backend(name: str = None):
+    # gmpy2 when it is installed, python ints otherwise
+    if name is None:
+        return BACKENDS.get('gmpy2', INT_BACKEND)
+    if name not in BACKENDS:
+        raise ValueError(f'big integer backend is not available: {name}')
+    return BACKENDS[name]
+
+
+class PrimeField:
+    """ arithmetic modulo the prime p """
+
+    def __init__(self, p: int, backend: Backend = INT_BACKEND):
+        self.p = p
+        self.backend = backend
+        self._p = backend.mpz(p)
+        self._sqrt_constants = None
+
+    def reduce(self, x):
+        return x % self.p
+
+    def mul(self, x, y):
+        return x * y % self.p
+
+    def sqr(self, x):
+        return x * x % self.p
+
+    def inv(self, x):
+        if not x % self.p:
+            return None
+        return int(self.backend.invert(x, self._p))
+
+    def batch_inv(self, values: list):
+        # montgomery's trick: inverts every value with a single modular inversion
+        # the inverses are returned in the backend type
+        p = self._p
+        prefix = []
+        acc = 1
+        for v in values:
+            prefix.append(acc)
+            if v % p:
+                acc = acc * v % p
+
+        acc_inv = self.inv(acc)
+        inverses = [None] * len(values)
+        for i in range(len(values) - 1, -1, -1):
+            v = values[i]
+            if v % p:
+                inverses[i] = acc_inv * prefix[i] % p
+                acc_inv = acc_inv * v % p
+        return inverses
+
+    def sqrt(self, x: int):
+        # tonelli-shanks, returns one of the two square roots or None for a non residue
+        p = self._p
+        powmod = self.backend.powmod
+        x %= p
+        if x < 2:
+            return int(x)
+        if powmod(x, (p - 1) // 2, p) != 1:
+            return None
+        if p % 4 == 3:
+            return int(powmod(x, (p + 1) // 4, p))
+
+        if self._sqrt_constants is None:
+            self._sqrt_constants = self._tonelli_shanks_constants()
+        q, s, c = self._sqrt_constants
+
+        m = s
+        t = powmod(x, q, p)
+        r = powmod(x, (q + 1) // 2, p)
+        while t != 1:
+            # smallest i with t^(2^i) = 1
+            i, t2 = 0, t
+            while t2 != 1:
+                t2 = t2 * t2 % p
+                i += 1
+            b = powmod(c, 1 << (m - i - 1), p)
+            m = i
+            c = b * b % p
+            t = t * c % p
+            r = r * b % p
+        return int(r)
+
+    def _tonelli_shanks_constants(self):
+        # p - 1 = q * 2^s with q odd, c = z^q for a non residue z
+        p = self._p
+        powmod = self.backend.powmod
+        q, s = p - 1, 0
+        while not q & 1:
+            q >>= 1
+            s += 1
+        z = 2
+        while powmod(z, (p - 1) // 2, p) != p - 1:
+            z += 1
+        return q, s, powmod(z, q, p)
+
+
+# endomorphism phi(x, y) = (beta * x, y) = lam * (x, y) and the reduced lattice basis (a1, b1, a2, b2)
+GLVParams = collections.namedtuple("GLVParams", ["beta", "lam", "basis"])
+
+# ECDSA signature, v is the parity of the y coordinate of the nonce point R (None when unknown)
+# and lets verify_batch recover R for the combined check
+Signature = collections.namedtuple("Signature", ["r", "s", "v"], defaults=(None,))
+
+CacheInfo = collections.namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class LRUCache:
+    """ bounded mapping that evicts the least recently used entry """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def keys(self):
+        return list(self._data)
+
+    def get(self, key, default=None):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        return self._data.pop(key, default)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._data))
+
+
+# a completed top level call of an instrumented curve: operation counts and seconds per phase
+CallStats = collections.namedtuple("CallStats", ["name", "counts", "phases", "elapsed"])
+
+# result of one item of encrypt_many/decrypt_many: error is None on success, value is None on failure
+BulkResult = collections.namedtuple("BulkResult", ["value", "error"])
+
+# phase context of a curve with instrumentation disabled
+NULL_PHASE = contextlib.nullcontext()
+
+
+class CurveStats:
+    """ operation counters and phase timings of an EllipticCurve with instrumentation enabled """
+
+    # modular multiplications, squarings, inversions, point additions and point doublings
+    COUNTERS = ('mul', 'sqr', 'inv', 'add', 'dbl')
+    PHASES = ('shared_secret', 'kdf', 'xor', 'encoding')
+
+    def __init__(self, callback=None):
+        # callback(CallStats) is called after every top level call
+        self.callback = callback
+        self.reset()
+
+    def reset(self):
+        # cumulative since the last reset, including operations done outside of top level calls
+        self.counts = dict.fromkeys(self.COUNTERS, 0)
+        self.phases = dict.fromkeys(self.PHASES, 0.0)
+        self.calls = collections.Counter()
+        self.last = None
+        self._depth = 0
+        self._start = None
+
+    def count(self, mul: int = 0, sqr: int = 0, inv: int = 0, add: int = 0, dbl: int = 0):
+        counts = self.counts
+        counts['mul'] += mul
+        counts['sqr'] += sqr
+        counts['inv'] += inv
+        counts['add'] += add
+        counts['dbl'] += dbl
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] += time.perf_counter() - start
+
+    def begin(self, name: str):
+        # nested calls (encrypt -> scalar_multiplication) are part of the outermost one
+        self._depth += 1
+        if self._depth == 1:
+            self._start = (name, dict(self.counts), dict(self.phases), time.perf_counter())
+
+    def end(self):
+        self._depth -= 1
+        if self._depth:
+            return
+        name, counts, phases, start = self._start
+        self.last = CallStats(
+            name,
+            {key: value - counts[key] for key, value in self.counts.items()},
+            {key: value - phases[key] for key, value in self.phases.items()},
+            time.perf_counter() - start)
+        self.calls[name] += 1
+        if self.callback is not None:
+            self.callback(self.last)
+
+
+def _instrumented(method):
+    # top level EllipticCurve calls reported to the curve stats, a single attribute check when disabled
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        stats = self._stats
+        if stats is None:
+            return method(self, *args, **kwargs)
+        stats.begin(method.__name__)
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            stats.end()
+    return wrapper
+
+
+class PointBatch:
+    """ struct of arrays container: x, y (and optionally jacobian z) coordinates as flat buffers
+    of fixed width big endian integers plus an infinity mask, one byte per point """
+
+    def __init__(self, coordinate_size: int, xs, ys, infinity, zs=None):
+        # the buffers are wrapped, not copied, so they may be bytearrays, mmaps or numpy arrays
+        self.coordinate_size = coordinate_size
+        self.xs = memoryview(xs).cast('B')
+        self.ys = memoryview(ys).cast('B')
+        self.zs = memoryview(zs).cast('B') if zs is not None else None
+        self.infinity = memoryview(infinity).cast('B')
+
+        size = len(self.infinity) * coordinate_size
+        if len(self.xs) != size or len(self.ys) != size or (self.zs is not None and len(self.zs) != size):
+            raise ValueError('coordinate buffers do not match the number of points')
+
+    @classmethod
+    def from_points(cls, points, coordinate_size: int):
+        xs, ys, infinity = bytearray(), bytearray(), bytearray()
+        empty = bytes(coordinate_size)
+        for P in points:
+            if P is None:
+                xs += empty
+                ys += empty
+                infinity.append(1)
+            else:
+                xs += int(P.x).to_bytes(coordinate_size, 'big')
+                ys += int(P.y).to_bytes(coordinate_size, 'big')
+                infinity.append(0)
+        return cls(coordinate_size, xs, ys, infinity)
+
+    @classmethod
+    def from_jacobian(cls, points, coordinate_size: int):
+        xs, ys, zs, infinity = bytearray(), bytearray(), bytearray(), bytearray()
+        for X, Y, Z in points:
+            xs += int(X).to_bytes(coordinate_size, 'big')
+            ys += int(Y).to_bytes(coordinate_size, 'big')
+            zs += int(Z).to_bytes(coordinate_size, 'big')
+            infinity.append(0 if Z else 1)
+        return cls(coordinate_size, xs, ys, infinity, zs)
+
+    def __len__(self):
+        return len(self.infinity)
+
+    def _coordinate(self, buffer: memoryview, i: int):
+        size = self.coordinate_size
+        return int.from_bytes(buffer[i * size:(i + 1) * size], 'big')
+
+    def x(self, i: int):
+        return self._coordinate(self.xs, i)
+
+    def y(self, i: int):
+        return self._coordinate(self.ys, i)
+
+    def is_infinity(self, i: int):
+        return bool(self.infinity[i])
+
+    def jacobian(self, i: int):
+        if self.zs is None:
+            return self.x(i), self.y(i), 0 if self.infinity[i] else 1
+        return self.x(i), self.y(i), self._coordinate(self.zs, i)
+
+    def __getitem__(self, i: int):
+        if self.zs is not None:
+            raise ValueError('the batch holds jacobian coordinates, normalize it first')
+        if i < 0:
+            i += len(self)
+        if self.infinity[i]:
+            return None
+        return Coor(self.x(i), self.y(i))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def to_points(self):
+        return list(self)
+
+    @property
+    def nbytes(self):
+        return len(self.xs) + len(self.ys) + len(self.infinity) + (len(self.zs) if self.zs is not None else 0)
+
 
 class EllipticCurve:
-    def __init__(self, a: int, b: int, mod_p: int, base_point: Coor):
+    # window width of the precomputed base point table
+    BASE_POINT_WINDOW = 4
+    # default window width of the wNAF variable base multiplication
+    WNAF_WINDOW = 4
+    # multi scalar multiplications with at least this many terms use the pippenger bucket method
+    PIPPENGER_THRESHOLD = 192
+    # default size of the shared secret cache when it is enabled
+    SHARED_SECRET_CACHE_SIZE = 1024
+    # number of registered peer point tables kept before the least recently used one is evicted
+    PEER_TABLE_CACHE_SIZE = 16
+
+    def __init__(self, a: int, b: int, mod_p: int, base_point: Coor, wnaf_window: int = WNAF_WINDOW,
+                 shared_secret_cache_size: int = 0, peer_table_cache_size: int = PEER_TABLE_CACHE_SIZE,
+                 backend: str = None, order: int = None, name: str = None, table_cache_dir: str = None,
+                 glv: 'GLVParams' = None):
         self.a = a
         self.b = b
         self.mod_p = mod_p
+        # order of the base point, when known
+        self.order = order
+        self.name = name
+        # directory of the on-disk base point table cache, None keeps the table in memory only
+        self.table_cache_dir = table_cache_dir
+        # endomorphism parameters of curves that support GLV scalar multiplication, needs the order
+        self.glv = glv if order else None
+        # backend (gmpy2 or int) selected once, the jacobian and ladder formulas work on its type
+        self.backend = get_backend(backend)
+        self.field = PrimeField(mod_p, self.backend)
+        self._p = self.backend.mpz(mod_p)
+        self._a = self.backend.mpz(a)
+        self._b = self.backend.mpz(b)
         self.base_point = base_point
+        self.wnaf_window = wnaf_window
+        self._base_point_table = None
+        self._scalar_field = None
+        self._peer_tables = LRUCache(peer_table_cache_size)
+        self._shared_secret_cache = None
+        if shared_secret_cache_size:
+            self.enable_shared_secret_cache(shared_secret_cache_size)
+        self._stats = None
+
+    def enable_stats(self, callback=None):
+        # opt in instrumentation, see CurveStats; operation counts follow the cost of each formula
+        self._stats = CurveStats(callback)
+        return self._stats
+
+    def disable_stats(self):
+        self._stats = None
+
+    @property
+    def stats(self):
+        return self._stats
+
+    def _phase(self, name: str):
+        if self._stats is None:
+            return NULL_PHASE
+        return self._stats.phase(name)
+
+    def __getstate__(self):
+        # pickled for process pool workers: the precomputed tables go along,
+        # instrumentation and cached shared secrets do not
+        state = self.__dict__.copy()
+        state['_stats'] = None
+        if self._shared_secret_cache is not None:
+            state['_shared_secret_cache'] = LRUCache(self._shared_secret_cache.maxsize)
+        return state
 
     def reduce_mod_p(self, x):
-        return x % self.mod_p
+        return self.field.reduce(x)
 
     def reduce_inverse_mod_p(self, x):
-        if not self.reduce_mod_p(x):
+        if self._stats is not None:
+            self._stats.count(inv=1)
+        return self.field.inv(x)
+
+    def batch_reduce_inverse_mod_p(self, values: list):
+        return [None if v is None else int(v) for v in self.field.batch_inv(values)]
+
+    def sqrt_mod_p(self, x: int):
+        return self.field.sqrt(x)
+
+    @property
+    def coordinate_size(self):
+        return (self.mod_p.bit_length() + 7) // 8
+
+    def encode_point(self, P: Coor, compressed: bool = True):
+        # SEC1: 0x00 for infinity, 0x02/0x03 || x compressed, 0x04 || x || y uncompressed
+        if P is None:
+            return b'\x00'
+        size = self.coordinate_size
+        x = self.reduce_mod_p(P.x).to_bytes(size, 'big')
+        y = self.reduce_mod_p(P.y)
+        if compressed:
+            return bytes([2 + (y & 1)]) + x
+        return b'\x04' + x + y.to_bytes(size, 'big')
+
+    def decode_point(self, data: bytes):
+        size = self.coordinate_size
+        if data == b'\x00':
             return None
-        # fermat corollary theorem
-        return pow(x, self.mod_p - 2, self.mod_p)
-        # return pow(x, -1, self.mod_p)
+        if not data or data[0] not in (2, 3, 4) or len(data) != (1 + 2 * size if data[0] == 4 else 1 + size):
+            raise ValueError('invalid point encoding')
+
+        x = int.from_bytes(data[1:1 + size], 'big')
+        if x >= self.mod_p:
+            raise ValueError('point coordinate out of range')
+
+        if data[0] == 4:
+            y = int.from_bytes(data[1 + size:], 'big')
+            if y >= self.mod_p or not self.is_point_on_curve(Coor(x, y)):
+                raise ValueError('point is not on the curve')
+            return Coor(x, y)
+
+        y = self.sqrt_mod_p(x * x * x + self.a * x + self.b)
+        if y is None:
+            raise ValueError('point is not on the curve')
+        if (y & 1) != (data[0] & 1):
+            y = self.mod_p - y
+        return Coor(x, y)
 
     def is_point_on_curve(self, P: Coor):
-        Z = self.reduce_mod_p(P.y ** 2)
-        R = self.reduce_mod_p((P.x ** 3) + self.a * P.x + self.b)
+        F = self.field
+        Z = F.sqr(P.y)
+        R = F.reduce((F.sqr(P.x) + self.a) * P.x + self.b)
         return Z == R
 
+    def validate_points(self, points):
+        # boolean mask over points (Coor, None, SEC1 encoded bytes or a PointBatch): True for finite points
+        # with both coordinates in [0, p) that satisfy the curve equation
+        p = self.mod_p
+        a = self.a % p
+        b = self.b % p
+        if isinstance(points, PointBatch):
+            return self._validate_point_batch(points, a, b)
+
+        mask = []
+        for P in points:
+            if isinstance(P, (bytes, bytearray, memoryview)):
+                try:
+                    P = self.decode_point(bytes(P))
+                except ValueError:
+                    mask.append(False)
+                    continue
+            if P is None:
+                mask.append(False)
+                continue
+            x, y = P
+            mask.append(0 <= x < p and 0 <= y < p and not (y * y - (x * x + a) * x - b) % p)
+        return mask
+
+    def _validate_point_batch(self, batch: PointBatch, a: int, b: int):
+        p = self.mod_p
+        size = batch.coordinate_size
+        xs, ys, infinity = batch.xs, batch.ys, batch.infinity
+        if batch.zs is not None:
+            # jacobian batches are validated through their affine form
+            batch = self.normalize_batch(batch)
+            xs, ys, infinity = batch.xs, batch.ys, batch.infinity
+
+        mask = []
+        for i in range(len(batch)):
+            if infinity[i]:
+                mask.append(False)
+                continue
+            x = int.from_bytes(xs[i * size:(i + 1) * size], 'big')
+            y = int.from_bytes(ys[i * size:(i + 1) * size], 'big')
+            mask.append(x < p and y < p and not (y * y - (x * x + a) * x - b) % p)
+        return mask
+
     def point_addition(self, P: Coor, Q: Coor):
         if P is None:
             # if p is infinite return q
@@ -66,65 +605,911 @@ class EllipticCurve:
 
         return Coor(X, Y)
 
+    def to_jacobian(self, P: Coor):
+        # (x, y) -> (X, Y, Z) with x = X/Z^2, y = Y/Z^3; Z = 0 is the infinite point
+        if P is None:
+            return JACOBIAN_INFINITY
+        mpz = self.backend.mpz
+        return mpz(P.x), mpz(P.y), mpz(1)
+
+    def from_jacobian(self, P: tuple):
+        X, Y, Z = P
+        if not Z:
+            return None
+        z_inv = self.reduce_inverse_mod_p(Z)
+        if self._stats is not None:
+            self._stats.count(mul=3, sqr=1)
+        z_inv_2 = self.reduce_mod_p(z_inv * z_inv)
+        return Coor(int(self.reduce_mod_p(X * z_inv_2)), int(self.reduce_mod_p(Y * z_inv_2 * z_inv)))
+
+    def normalize_batch(self, batch: PointBatch):
+        # affine PointBatch from a jacobian one, with a single inversion
+        if batch.zs is None:
+            return batch
+        affine = self.batch_from_jacobian([batch.jacobian(i) for i in range(len(batch))], native=True)
+        return PointBatch.from_points(affine, self.coordinate_size)
+
+    def batch_from_jacobian(self, points: list, native: bool = False):
+        # native keeps the coordinates in the backend type, for the internal precomputed tables
+        p = self._p
+        if self._stats is not None:
+            # montgomery's trick plus the normalization of every point
+            self._stats.count(mul=6 * len(points), sqr=len(points), inv=1)
+        z_invs = self.field.batch_inv([Z for _, _, Z in points])
+        affine = []
+        for (X, Y, _), z_inv in zip(points, z_invs):
+            if z_inv is None:
+                affine.append(None)
+                continue
+            z_inv_2 = z_inv * z_inv % p
+            if native:
+                affine.append(Coor(X * z_inv_2 % p, Y * z_inv_2 * z_inv % p))
+            else:
+                affine.append(Coor(int(X * z_inv_2 % p), int(Y * z_inv_2 * z_inv % p)))
+        return affine
+
+    def jacobian_doubling(self, P: tuple):
+        X, Y, Z = P
+        if not Z or not Y:
+            return JACOBIAN_INFINITY
+        if self._stats is not None:
+            self._stats.count(mul=4, sqr=6, dbl=1)
+        p = self._p
+
+        XX = X * X % p
+        YY = Y * Y % p
+        YYYY = YY * YY % p
+        ZZ = Z * Z % p
+        # S = 4*X*Y^2, M = 3*X^2 + a*Z^4
+        S = 4 * X * YY % p
+        M = (3 * XX + self._a * ZZ * ZZ) % p
+        X3 = (M * M - 2 * S) % p
+        Y3 = (M * (S - X3) - 8 * YYYY) % p
+        Z3 = 2 * Y * Z % p
+        return X3, Y3, Z3
+
+    def jacobian_addition(self, P: tuple, Q: tuple):
+        X1, Y1, Z1 = P
+        X2, Y2, Z2 = Q
+        if not Z1:
+            return Q
+        if not Z2:
+            return P
+        p = self._p
+
+        Z1Z1 = Z1 * Z1 % p
+        Z2Z2 = Z2 * Z2 % p
+        U1 = X1 * Z2Z2 % p
+        U2 = X2 * Z1Z1 % p
+        S1 = Y1 * Z2 * Z2Z2 % p
+        S2 = Y2 * Z1 * Z1Z1 % p
+        H = (U2 - U1) % p
+        r = (S2 - S1) % p
+        if not H:
+            if not r:
+                return self.jacobian_doubling(P)
+            return JACOBIAN_INFINITY
+        if self._stats is not None:
+            self._stats.count(mul=12, sqr=4, add=1)
+
+        HH = H * H % p
+        HHH = H * HH % p
+        V = U1 * HH % p
+        X3 = (r * r - HHH - 2 * V) % p
+        Y3 = (r * (V - X3) - S1 * HHH) % p
+        Z3 = Z1 * Z2 * H % p
+        return X3, Y3, Z3
+
+    def jacobian_mixed_addition(self, P: tuple, Q: Coor):
+        # same as jacobian_addition with Q in affine form (Z2 = 1)
+        if Q is None:
+            return P
+        X1, Y1, Z1 = P
+        if not Z1:
+            return self.to_jacobian(Q)
+        p = self._p
+
+        Z1Z1 = Z1 * Z1 % p
+        U2 = Q.x * Z1Z1 % p
+        S2 = Q.y * Z1 * Z1Z1 % p
+        H = (U2 - X1) % p
+        r = (S2 - Y1) % p
+        if not H:
+            if not r:
+                return self.jacobian_doubling(P)
+            return JACOBIAN_INFINITY
+        if self._stats is not None:
+            self._stats.count(mul=8, sqr=3, add=1)
+
+        HH = H * H % p
+        HHH = H * HH % p
+        V = X1 * HH % p
+        X3 = (r * r - HHH - 2 * V) % p
+        Y3 = (r * (V - X3) - Y1 * HHH) % p
+        Z3 = Z1 * H % p
+        return X3, Y3, Z3
+
+    @_instrumented
     def scalar_multiplication(self, k: int, P: Coor):
         k = self.reduce_mod_p(k)
 
         if not k or P is None:
             return None
 
-        Q = None
-        while k:
-            if k & 1 != 0:
-                Q = self.point_addition(Q, P)
-            P = self.point_addition(P, P)
+        return self.from_jacobian(self._jacobian_scalar_multiplication(k, P))
+
+    def _jacobian_scalar_multiplication(self, k: int, P: Coor):
+        # picks the fastest available method for k*P, k is already reduced
+        if P == self.base_point:
+            return self._fixed_base_multiplication(k, self.get_base_point_table(), self.BASE_POINT_WINDOW)
+        table = self._peer_table(P)
+        if table is not None:
+            return self._fixed_base_multiplication(k, table, self.BASE_POINT_WINDOW)
+        if self.glv is not None:
+            return self._glv_multiplication(k, P, self.wnaf_window)
+        return self._wnaf_multiplication(k, P, self.wnaf_window)
+
+    def glv_decomposition(self, k: int):
+        # k = k1 + k2 * lambda (mod n) with |k1|, |k2| about sqrt(n), using the short lattice basis
+        # (a1, b1), (a2, b2) of {(x, y): x + y * lambda = 0 (mod n)}
+        n = self.order
+        a1, b1, a2, b2 = self.glv.basis
+        c1 = (b2 * k + n // 2) // n
+        c2 = (-b1 * k + n // 2) // n
+        k1 = k - c1 * a1 - c2 * a2
+        k2 = -c1 * b1 - c2 * b2
+        return k1, k2
 
+    def _glv_multiplication(self, k: int, P: Coor, width: int):
+        # k*P = k1*P + k2*phi(P) with phi(x, y) = (beta*x, y) = lambda*P,
+        # both half length scalars are evaluated together on one doubling chain
+        p = self._p
+        beta = self.glv.beta
+        width = max(width, 2)
+        k1, k2 = self.glv_decomposition(k % self.order)
+
+        multiples = self._odd_multiples([P], width)[0]
+        # phi maps the odd multiples of P to the odd multiples of phi(P) for one multiplication each
+        endomorphism_multiples = [None if M is None else Coor(beta * M.x % p, M.y) for M in multiples]
+
+        digits = []
+        for k_i in (k1, k2):
+            k_digits = self.wnaf(abs(k_i), width)
+            digits.append(k_digits if k_i >= 0 else [-d for d in k_digits])
+        return self._interleaved_wnaf(digits, [multiples, endomorphism_multiples])
+
+    @_instrumented
+    def wnaf_multiplication(self, k: int, P: Coor, width: int = None):
+        k = self.reduce_mod_p(k)
+
+        if not k or P is None:
+            return None
+
+        return self.from_jacobian(self._wnaf_multiplication(k, P, width or self.wnaf_window))
+
+    @staticmethod
+    def wnaf(k: int, width: int):
+        # width-w non adjacent form, least significant digit first
+        # every non zero digit is odd, |d| < 2^(w-1), and is followed by at least w-1 zeros
+        window = 1 << width
+        half_window = window >> 1
+        digits = []
+        while k:
+            if k & 1:
+                d = k & (window - 1)
+                if d >= half_window:
+                    d -= window
+                k -= d
+            else:
+                d = 0
+            digits.append(d)
             k >>= 1
+        return digits
+
+    def _odd_multiples(self, points: list, width: int):
+        # [P, 3P, 5P, ..., (2^(w-1) - 1)P] for every point, normalized to affine with one inversion
+        count = 1 << (width - 2)
+        multiples = []
+        for P in points:
+            P_jacobian = self.to_jacobian(P)
+            P2 = self.jacobian_doubling(P_jacobian)
+            multiples.append(P_jacobian)
+            for _ in range(count - 1):
+                multiples.append(self.jacobian_addition(multiples[-1], P2))
+        affine = self.batch_from_jacobian(multiples, native=True)
+        return [affine[i:i + count] for i in range(0, len(affine), count)]
+
+    def _wnaf_multiplication(self, k: int, P: Coor, width: int):
+        p = self._p
+        if width < 2:
+            return self._jacobian_double_and_add(k, P)
+
+        multiples = self._odd_multiples([P], width)[0]
+        negated = [None if M is None else Coor(M.x, -M.y % p) for M in multiples]
+
+        Q = JACOBIAN_INFINITY
+        for d in reversed(self.wnaf(k, width)):
+            Q = self.jacobian_doubling(Q)
+            if d > 0:
+                Q = self.jacobian_mixed_addition(Q, multiples[d >> 1])
+            elif d < 0:
+                Q = self.jacobian_mixed_addition(Q, negated[-d >> 1])
         return Q
 
+    @_instrumented
+    def x_only_scalar_multiplication(self, k: int, P: Coor):
+        # x coordinate of k*P, computed with a montgomery ladder on (X : Z) projective x coordinates
+        k = self.reduce_mod_p(k)
+
+        if not k or P is None:
+            return None
+
+        table = self._peer_table(P)
+        if table is not None:
+            Q = self.from_jacobian(self._fixed_base_multiplication(k, table, self.BASE_POINT_WINDOW))
+            return Q.x if Q is not None else None
+
+        if not self.reduce_mod_p(P.x):
+            # the differential addition degenerates when x(P) = 0
+            Q = self.wnaf_multiplication(k, P)
+            return Q.x if Q is not None else None
+
+        (X, Z), _ = self._x_only_ladder(k, self.backend.mpz(P.x))
+        if not Z:
+            return None
+        return int(self.reduce_mod_p(X * self.reduce_inverse_mod_p(Z)))
+
+    def _x_only_ladder(self, k: int, x: int):
+        # invariant R1 - R0 = P, every bit costs one differential addition and one doubling:
+        # x(R0 + R1): X' = (X0X1 - aZ0Z1)^2 - 4bZ0Z1(X0Z1 + X1Z0), Z' = x * (X0Z1 - X1Z0)^2
+        # x(2R):      X' = (X^2 - aZ^2)^2 - 8bXZ^3,                Z' = 4Z(X^3 + aXZ^2 + bZ^3)
+        p = self._p
+        a = self._a
+        b = self._b % p
+        b4 = 4 * b % p
+
+        X0, Z0 = x, 1
+        XX = x * x % p
+        t = (XX - a) % p
+        X1 = (t * t - 2 * b4 * x) % p
+        Z1 = 4 * (XX * x + a * x + b) % p
+
+        if self._stats is not None:
+            # one differential addition (8M + 2S) and one doubling (7M + 3S) per bit
+            steps = k.bit_length() - 1
+            self._stats.count(mul=15 * steps, sqr=5 * steps, add=steps, dbl=steps + 1)
+
+        for bit in bin(k)[3:]:
+            if bit == '1':
+                X0, Z0, X1, Z1 = X1, Z1, X0, Z0
+
+            X0X1 = X0 * X1 % p
+            Z0Z1 = Z0 * Z1 % p
+            X0Z1 = X0 * Z1 % p
+            X1Z0 = X1 * Z0 % p
+            t = (X0X1 - a * Z0Z1) % p
+            u = (X0Z1 - X1Z0) % p
+            X_add = (t * t - b4 * Z0Z1 % p * (X0Z1 + X1Z0)) % p
+            Z_add = x * (u * u % p) % p
+
+            XX = X0 * X0 % p
+            ZZ = Z0 * Z0 % p
+            bZZ = b * ZZ % p
+            t = (XX - a * ZZ) % p
+            X_dbl = (t * t - 8 * X0 * (bZZ * Z0 % p)) % p
+            Z_dbl = 4 * Z0 * ((XX + a * ZZ) % p * X0 + bZZ * Z0) % p
+
+            if bit == '1':
+                X0, Z0, X1, Z1 = X_add, Z_add, X_dbl, Z_dbl
+            else:
+                X0, Z0, X1, Z1 = X_dbl, Z_dbl, X_add, Z_add
+        return (X0, Z0), (X1, Z1)
+
+    def get_base_point_table(self):
+        # built (or loaded from the on-disk cache) on first use and kept for the lifetime of the curve
+        if self._base_point_table is None:
+            table = self._load_table_cache() if self.table_cache_dir else None
+            if table is None:
+                table = self._build_fixed_base_table(self.base_point, self.BASE_POINT_WINDOW)
+                if self.table_cache_dir:
+                    self._save_table_cache(table)
+            self._base_point_table = table
+        return self._base_point_table
+
+    def _table_cache_digest(self):
+        params = (self.a, self.b, self.mod_p, self.base_point.x, self.base_point.y, self.BASE_POINT_WINDOW)
+        return hashlib.sha256(repr(params).encode()).digest()
+
+    def table_cache_path(self):
+        name = (self.name or 'curve').replace('/', '_')
+        return os.path.join(self.table_cache_dir, f'{name}-w{self.BASE_POINT_WINDOW}-'
+                                                  f'{self._table_cache_digest().hex()[:16]}.table')
+
+    def _save_table_cache(self, table: list):
+        # entries are SEC1 uncompressed points (0x00 padded for infinity), one row after the other
+        size = self.coordinate_size
+        entry_size = 1 + 2 * size
+        body = b''.join(self.encode_point(P, compressed=False).ljust(entry_size, b'\x00')
+                        for row in table for P in row[1:])
+        header = TABLE_CACHE_HEADER.pack(TABLE_CACHE_MAGIC, TABLE_CACHE_VERSION, self.BASE_POINT_WINDOW,
+                                         len(table), size, self._table_cache_digest(),
+                                         hashlib.sha256(body).digest())
+        path = self.table_cache_path()
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(self.table_cache_dir, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(header + body)
+            # atomic, concurrent workers never see a half written table
+            os.replace(tmp_path, path)
+        except OSError:
+            # the cache is best effort, the table stays in memory
+            pass
+
+    def _load_table_cache(self):
+        # the table file is memory mapped, a stale, foreign or corrupt file is ignored and rebuilt
+        try:
+            with open(self.table_cache_path(), 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                return self._decode_table_cache(view)
+        except (OSError, ValueError):
+            return None
+
+    def _decode_table_cache(self, view: memoryview):
+        magic, version, width, rows, size, digest, body_digest = TABLE_CACHE_HEADER.unpack_from(view)
+        if (magic != TABLE_CACHE_MAGIC or version != TABLE_CACHE_VERSION or width != self.BASE_POINT_WINDOW
+                or size != self.coordinate_size or digest != self._table_cache_digest()):
+            return None
+
+        row_size = (1 << width) - 1
+        entry_size = 1 + 2 * size
+        body = view[TABLE_CACHE_HEADER.size:]
+        if len(body) != rows * row_size * entry_size or hashlib.sha256(body).digest() != body_digest:
+            return None
+
+        mpz = self.backend.mpz
+        table = []
+        for i in range(rows):
+            row = [None]
+            for j in range(row_size):
+                offset = (i * row_size + j) * entry_size
+                if not body[offset]:
+                    row.append(None)
+                    continue
+                x = int.from_bytes(body[offset + 1:offset + 1 + size], 'big')
+                y = int.from_bytes(body[offset + 1 + size:offset + entry_size], 'big')
+                row.append(Coor(mpz(x), mpz(y)))
+            table.append(row)
+        return table
+
+    def register_peer_point(self, P: Coor):
+        # precomputes a fixed-base table for a frequently used point (e.g. a recipient public key)
+        # so multiplications by it skip the doublings like the base point does
+        if P is None or P == self.base_point or P in self._peer_tables:
+            return
+        self._peer_tables.put(P, self._build_fixed_base_table(P, self.BASE_POINT_WINDOW))
+
+    def unregister_peer_point(self, P: Coor):
+        self._peer_tables.pop(P)
+
+    def peer_table_cache_info(self):
+        return self._peer_tables.info()
+
+    def _peer_table(self, P: Coor):
+        if not len(self._peer_tables):
+            return None
+        return self._peer_tables.get(P)
+
+    def _build_fixed_base_table(self, P: Coor, width: int):
+        # table[i][d] = d * 2^(width*i) * P in affine form, table[i][0] is the infinite point
+        rows = (self.mod_p.bit_length() + width - 1) // width
+        row_size = (1 << width) - 1
+
+        points = []
+        B = self.to_jacobian(P)
+        for _ in range(rows):
+            row = [B]
+            for _ in range(row_size - 1):
+                row.append(self.jacobian_addition(row[-1], B))
+            points.extend(row)
+            B = self.jacobian_addition(row[-1], B)
+
+        affine = self.batch_from_jacobian(points, native=True)
+        return [[None] + affine[i * row_size:(i + 1) * row_size] for i in range(rows)]
+
+    def _fixed_base_multiplication(self, k: int, table: list, width: int):
+        # one table lookup and mixed addition per window, no doublings
+        mask = (1 << width) - 1
+        Q = JACOBIAN_INFINITY
+        for row in table:
+            if not k:
+                break
+            d = k & mask
+            if d:
+                Q = self.jacobian_mixed_addition(Q, row[d])
+            k >>= width
+        return Q
+
+    def _jacobian_double_and_add(self, k: int, P: Coor):
+        # left-to-right double-and-add, P stays affine so every addition is a mixed one
+        Q = JACOBIAN_INFINITY
+        for bit in bin(k)[2:]:
+            Q = self.jacobian_doubling(Q)
+            if bit == '1':
+                Q = self.jacobian_mixed_addition(Q, P)
+        return Q
+
+    @_instrumented
+    def multi_scalar_multiplication(self, pairs, points: PointBatch = None):
+        # sum of k_i * P_i for an iterable of (k_i, P_i) pairs,
+        # or for the scalars in pairs and the points of a PointBatch given as points
+        if points is not None:
+            pairs = zip(pairs, self.normalize_batch(points))
+        terms = []
+        for k, P in pairs:
+            k = self.reduce_mod_p(k)
+            if k and P is not None:
+                terms.append((k, P))
+
+        return self.from_jacobian(self._jacobian_multi_scalar_multiplication(terms))
+
+    def _jacobian_multi_scalar_multiplication(self, terms: list):
+        # terms are (k, P) pairs with reduced non zero k and finite P
+        if not terms:
+            return JACOBIAN_INFINITY
+        if len(terms) == 1:
+            return self._jacobian_scalar_multiplication(*terms[0])
+        if len(terms) < self.PIPPENGER_THRESHOLD:
+            return self._straus_multiplication(terms, self.wnaf_window)
+        return self._pippenger_multiplication(terms)
+
+    def _straus_multiplication(self, terms: list, width: int):
+        # shamir's trick: all terms share a single doubling chain,
+        # each term adds its own precomputed odd multiple on its non zero wNAF digits
+        width = max(width, 2)
+        multiples = self._odd_multiples([P for _, P in terms], width)
+        digits = [self.wnaf(k, width) for k, _ in terms]
+        return self._interleaved_wnaf(digits, multiples)
+
+    def _interleaved_wnaf(self, digits: list, multiples: list):
+        # digits[j] is the wNAF of the j-th scalar, multiples[j] the odd multiples of its point
+        p = self._p
+        negated = [[None if M is None else Coor(M.x, -M.y % p) for M in row] for row in multiples]
+
+        Q = JACOBIAN_INFINITY
+        for i in range(max(len(d) for d in digits) - 1, -1, -1):
+            Q = self.jacobian_doubling(Q)
+            for j, term_digits in enumerate(digits):
+                if i >= len(term_digits):
+                    continue
+                d = term_digits[i]
+                if d > 0:
+                    Q = self.jacobian_mixed_addition(Q, multiples[j][d >> 1])
+                elif d < 0:
+                    Q = self.jacobian_mixed_addition(Q, negated[j][-d >> 1])
+        return Q
+
+    def _pippenger_multiplication(self, terms: list):
+        # bucket method: for every c-bit window drop each point into the bucket of its digit,
+        # then sum_d d * bucket[d] is evaluated with 2 * 2^c additions through running sums
+        c = max(2, len(terms).bit_length() - 3)
+        mask = (1 << c) - 1
+        bits = max(k.bit_length() for k, _ in terms)
+
+        Q = JACOBIAN_INFINITY
+        for shift in range((bits - 1) // c * c, -1, -c):
+            for _ in range(c):
+                Q = self.jacobian_doubling(Q)
+
+            buckets = [JACOBIAN_INFINITY] * (mask + 1)
+            for k, P in terms:
+                d = (k >> shift) & mask
+                if d:
+                    buckets[d] = self.jacobian_mixed_addition(buckets[d], P)
+
+            running = JACOBIAN_INFINITY
+            window_sum = JACOBIAN_INFINITY
+            for d in range(mask, 0, -1):
+                running = self.jacobian_addition(running, buckets[d])
+                window_sum = self.jacobian_addition(window_sum, running)
+            Q = self.jacobian_addition(Q, window_sum)
+        return Q
+
+    @_instrumented
+    def shared_secret(self, private_key: int, P: Coor):
+        # ECDH: x coordinate of private_key * P, served from the shared secret cache when it is enabled
+        cache = self._shared_secret_cache
+        if cache is None:
+            return self._shared_secret(private_key, P)
+
+        key = (private_key, P)
+        secret_x = cache.get(key)
+        if secret_x is None:
+            secret_x = self._shared_secret(private_key, P)
+            cache.put(key, secret_x)
+        return secret_x
+
+    def _shared_secret(self, private_key: int, P: Coor):
+        if self.glv is None:
+            secret_x = self.x_only_scalar_multiplication(private_key, P)
+        else:
+            # the GLV split halves the doubling chain, faster than the ladder on curves that support it
+            k = self.reduce_mod_p(private_key)
+            Q = self.from_jacobian(self._jacobian_scalar_multiplication(k, P)) if k and P is not None else None
+            secret_x = Q.x if Q is not None else None
+        if secret_x is None:
+            raise ValueError('shared secret is the point at infinity')
+        return secret_x
+
+    def enable_shared_secret_cache(self, maxsize: int = SHARED_SECRET_CACHE_SIZE):
+        # opt in: keeps up to maxsize (private key, peer point) -> shared secret entries
+        self._shared_secret_cache = LRUCache(maxsize)
+
+    def disable_shared_secret_cache(self):
+        self._shared_secret_cache = None
+
+    def shared_secret_cache_info(self):
+        if self._shared_secret_cache is None:
+            return None
+        return self._shared_secret_cache.info()
+
+    def invalidate_shared_secrets(self, private_key: int = None, P: Coor = None):
+        # drops the entries matching private_key and/or P, everything when neither is given
+        cache = self._shared_secret_cache
+        if cache is None:
+            return
+        if private_key is None and P is None:
+            cache.clear()
+            return
+        for key in cache.keys():
+            if (private_key is None or key[0] == private_key) and (P is None or key[1] == P):
+                cache.pop(key)
+
+    @_instrumented
     def generate_keys(self, private_key: int):
         public_key = self.scalar_multiplication(private_key, self.base_point)
         return private_key, public_key
 
+    @_instrumented
+    def generate_keys_batch(self, private_keys, as_batch: bool = False):
+        # private_keys is either a list of private keys or the number of random keys to generate
+        # as_batch returns (private_keys, PointBatch of public keys) instead of (private_key, public_key) pairs
+        if isinstance(private_keys, int):
+            private_keys = [self.generate_random_n() for _ in range(private_keys)]
+
+        table = self.get_base_point_table()
+        public_keys = self.batch_from_jacobian([
+            self._fixed_base_multiplication(self.reduce_mod_p(private_key), table, self.BASE_POINT_WINDOW)
+            for private_key in private_keys
+        ], native=as_batch)
+        if as_batch:
+            return private_keys, PointBatch.from_points(public_keys, self.coordinate_size)
+        return list(zip(private_keys, public_keys))
+
     def generate_random_n(self):
-        return random.randint(1, self.mod_p - 1)
+        return random.randint(1, (self.order or self.mod_p) - 1)
+
+    def _encryption_secret(self, public_key: Coor, common_secret_encryption_point: Coor = None):
+        with self._phase('shared_secret'):
+            return self._ephemeral_secret(public_key, common_secret_encryption_point)
 
-    def encrypt(self, message: str, public_key: Coor, common_secret_encryption_point: Coor = None):
+    def _ephemeral_secret(self, public_key: Coor, common_secret_encryption_point: Coor = None):
         if not common_secret_encryption_point:
             encryption_scalar_key = self.generate_random_n()
             common_secret_encryption_point = self.scalar_multiplication(encryption_scalar_key, self.base_point)
-            secret_key = self.scalar_multiplication(encryption_scalar_key, public_key)
+            # the ephemeral scalar is never reused, so it bypasses the shared secret cache
+            secret_x = self._shared_secret(encryption_scalar_key, public_key)
         else:
-            secret_key = common_secret_encryption_point
+            secret_x = common_secret_encryption_point[0]
+        return common_secret_encryption_point, secret_x
 
-        encryption_key = hashlib.sha256(str(secret_key[0]).encode()).digest()
+    @_instrumented
+    def encrypt(self, message: Union[str, bytes], public_key: Coor, common_secret_encryption_point: Coor = None):
+        common_secret_encryption_point, secret_x = self._encryption_secret(public_key, common_secret_encryption_point)
 
-        message_bytes = message.encode()
+        with self._phase('kdf'):
+            encryption_key = hashlib.sha256(str(secret_x).encode()).digest()
+
+        message_bytes = message.encode() if isinstance(message, str) else message
 
         # XOR encryption with the encryption key
-        encrypted_message = bytearray()
-        for i in range(len(message_bytes)):
-            encrypted_byte = message_bytes[i] ^ encryption_key[i % len(encryption_key)]
-            encrypted_message.append(encrypted_byte)
+        with self._phase('xor'):
+            encrypted_message = xor_bytes(message_bytes, repeat_key(encryption_key, len(message_bytes)))
 
-        base64_bytes = base64.b64encode(encrypted_message)
+        with self._phase('encoding'):
+            base64_bytes = base64.b64encode(encrypted_message)
         return common_secret_encryption_point, str(base64_bytes, 'utf-8')
 
+    @_instrumented
     def decrypt(self, ciphertext: str, private_key: int, common_secret_encryption_point: Coor):
-        secret_key = self.scalar_multiplication(private_key, common_secret_encryption_point)
-        encryption_key = hashlib.sha256(str(secret_key[0]).encode()).digest()
-        ciphertext = base64.b64decode(ciphertext)
+        with self._phase('shared_secret'):
+            secret_x = self.shared_secret(private_key, common_secret_encryption_point)
+        with self._phase('kdf'):
+            encryption_key = hashlib.sha256(str(secret_x).encode()).digest()
+        with self._phase('encoding'):
+            ciphertext = base64.b64decode(ciphertext)
         # XOR decrypt with the encryption key
-        decrypted_message = bytearray()
-        for i in range(len(ciphertext)):
-            decrypted_byte = ciphertext[i] ^ encryption_key[i % len(encryption_key)]
-            decrypted_message.append(decrypted_byte)
+        with self._phase('xor'):
+            decrypted_message = xor_bytes(ciphertext, repeat_key(encryption_key, len(ciphertext)))
+
+        with self._phase('encoding'):
+            return self._decode_message(decrypted_message)
 
+    @staticmethod
+    def _decode_message(message: bytes):
         try:
-            res = str(decrypted_message, 'utf-8')
+            res = str(message, 'utf-8')
         except:
-            res = ''.join(format(x, '02x') for x in decrypted_message)
+            res = ''.join(format(x, '02x') for x in message)
         return res
 
+    @_instrumented
+    def encrypt_envelope(self, message: Union[str, bytes], public_key: Coor,
+                         common_secret_encryption_point: Coor = None):
+        # version || compressed encryption point || counter mode ciphertext, see encrypt_stream
+        common_secret_encryption_point, secret_x = self._encryption_secret(public_key, common_secret_encryption_point)
+        message_bytes = message.encode() if isinstance(message, str) else message
+        encrypted_message = self._xor_keystream(message_bytes, secret_x, 0)
+        with self._phase('encoding'):
+            return bytes([ENVELOPE_VERSION]) + self.encode_point(common_secret_encryption_point) + encrypted_message
+
+    @_instrumented
+    def decrypt_envelope(self, envelope: bytes, private_key: int):
+        with self._phase('encoding'):
+            common_secret_encryption_point, ciphertext = self.unpack_envelope(envelope)
+        with self._phase('shared_secret'):
+            secret_x = self.shared_secret(private_key, common_secret_encryption_point)
+        message = self._xor_keystream(ciphertext, secret_x, 0)
+        with self._phase('encoding'):
+            return self._decode_message(message)
+
+    def unpack_envelope(self, envelope: bytes):
+        if not envelope or envelope[0] != ENVELOPE_VERSION:
+            raise ValueError('unsupported envelope version')
+        point_end = 2 + self.coordinate_size
+        return self.decode_point(envelope[1:point_end]), envelope[point_end:]
+
+    def process_pool(self, max_workers: int = None, mp_context=None):
+        # executor for encrypt_many/decrypt_many, every worker receives the curve and its tables once at start up
+        self.get_base_point_table()
+        return ProcessPoolExecutor(max_workers, mp_context, initializer=_init_curve_worker, initargs=(self,))
+
+    def encrypt_many(self, messages, public_key: Coor, executor: ProcessPoolExecutor = None,
+                     max_workers: int = None, chunk_size: int = BULK_CHUNK_SIZE):
+        # encrypt every message for public_key, one BulkResult((encryption point, ciphertext), error) per message
+        # executor must come from process_pool of this curve, otherwise a pool is created for this call
+        return self._run_many(_encrypt_chunk, [(message, public_key) for message in messages],
+                              executor, max_workers, chunk_size)
+
+    def decrypt_many(self, items, private_key: int, executor: ProcessPoolExecutor = None,
+                     max_workers: int = None, chunk_size: int = BULK_CHUNK_SIZE):
+        # items are (ciphertext, encryption point) pairs, one BulkResult(plaintext, error) per item
+        return self._run_many(_decrypt_chunk, [(ciphertext, private_key, P) for ciphertext, P in items],
+                              executor, max_workers, chunk_size)
+
+    def _run_many(self, task, items: list, executor: ProcessPoolExecutor, max_workers: int, chunk_size: int):
+        if not items:
+            return []
+        own_executor = executor is None
+        if own_executor:
+            executor = self.process_pool(max_workers)
+
+        curve_key = (self.a, self.b, self.mod_p, self.base_point)
+        try:
+            chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+            futures = [executor.submit(task, curve_key, chunk) for chunk in chunks]
+            results = []
+            for chunk, future in zip(chunks, futures):
+                try:
+                    results.extend(future.result())
+                except Exception as e:
+                    # the whole chunk was lost, e.g. a worker died
+                    results.extend(BulkResult(None, e) for _ in chunk)
+            return results
+        finally:
+            if own_executor:
+                executor.shutdown()
+
+    def _order_field(self):
+        if self.order is None:
+            raise ValueError('the curve order is required for signatures')
+        if self._scalar_field is None:
+            self._scalar_field = PrimeField(self.order, self.backend)
+        return self._scalar_field
+
+    def hash_message(self, message: Union[str, bytes]):
+        # sha256 of the message, truncated to the bit length of the order
+        message_bytes = message.encode() if isinstance(message, str) else message
+        digest = hashlib.sha256(message_bytes).digest()
+        return int.from_bytes(digest, 'big') >> max(0, len(digest) * 8 - self.order.bit_length())
+
+    @_instrumented
+    def sign(self, message: Union[str, bytes], private_key: int):
+        # ECDSA, the nonce comes from the secrets module
+        n = self._order_field().p
+        e = self.hash_message(message)
+        while True:
+            k = secrets.randbelow(n - 1) + 1
+            R = self.scalar_multiplication(k, self.base_point)
+            r = R.x % n
+            if not r:
+                continue
+            if self._stats is not None:
+                self._stats.count(inv=1, mul=2)
+            s = self._order_field().inv(k) * (e + r * private_key) % n
+            if s:
+                return Signature(r, s, R.y & 1 if R.x < n else None)
+
+    @_instrumented
+    def verify(self, message: Union[str, bytes], signature: tuple, public_key: Coor):
+        n = self._order_field().p
+        r, s = signature[0], signature[1]
+        # same key rule as verify_batch: finite, coordinates in [0, p) and on the curve
+        if not (0 < r < n and 0 < s < n) or not self.validate_points([public_key])[0]:
+            return False
+
+        if self._stats is not None:
+            self._stats.count(inv=1, mul=2)
+        w = self._order_field().inv(s)
+        u1 = self.hash_message(message) * w % n
+        u2 = r * w % n
+        X = self.from_jacobian(self._verification_point(u1, u2, public_key))
+        return X is not None and X.x % n == r
+
+    def _verification_point(self, u1: int, u2: int, public_key: Coor):
+        # u1*G + u2*Q: the base point part is table lookups only
+        u1_G = self._fixed_base_multiplication(u1, self.get_base_point_table(), self.BASE_POINT_WINDOW)
+        if not u2:
+            return u1_G
+        return self.jacobian_addition(u1_G, self._jacobian_scalar_multiplication(u2, public_key))
+
+    @_instrumented
+    def verify_batch(self, items):
+        # items are (message, signature, public_key) tuples, returns one bool per item
+        # the s inversions are shared (montgomery's trick modulo n); signatures carrying v are checked
+        # together with a randomized multi scalar multiplication
+        #   (sum z_i u1_i) G + sum z_i u2_i Q_i - sum z_i R_i = O
+        # and are only checked one by one when that combined check fails
+        field = self._order_field()
+        n = field.p
+        items = list(items)
+        results = [False] * len(items)
+
+        valid = []
+        keys_mask = self.validate_points([public_key for _, _, public_key in items])
+        for i, (message, signature, public_key) in enumerate(items):
+            r, s = signature[0], signature[1]
+            if 0 < r < n and 0 < s < n and keys_mask[i]:
+                valid.append(i)
+        if self._stats is not None:
+            self._stats.count(inv=1, mul=3 * len(valid))
+        inverses = field.batch_inv([items[i][1][1] for i in valid])
+
+        combined = []
+        single = []
+        for i, w in zip(valid, inverses):
+            message, signature, public_key = items[i]
+            r = signature[0]
+            v = signature[2] if len(signature) > 2 else None
+            u1 = self.hash_message(message) * w % n
+            u2 = r * w % n
+            R = self._recover_nonce_point(r, v) if v is not None else None
+            if R is None:
+                single.append((i, u1, u2, r))
+            else:
+                combined.append((i, u1, u2, r, R, public_key))
+
+        if combined:
+            if self._combined_check(combined):
+                for i, *_ in combined:
+                    results[i] = True
+            else:
+                single.extend((i, u1, u2, r) for i, u1, u2, r, _, _ in combined)
+
+        # the remaining verification points are normalized together with a single inversion
+        points = self.batch_from_jacobian(
+            [self._verification_point(u1, u2, items[i][2]) for i, u1, u2, _ in single])
+        for (i, _, _, r), X in zip(single, points):
+            results[i] = X is not None and X.x % n == r
+        return results
+
+    def _recover_nonce_point(self, r: int, v: int):
+        y = self.sqrt_mod_p(r * r * r + self.a * r + self.b)
+        if y is None:
+            return None
+        if (y & 1) != (v & 1):
+            y = self.mod_p - y
+        return Coor(r, y)
+
+    def _combined_check(self, combined: list):
+        # random 128 bit weights z_i keep an invalid signature from cancelling out against the others
+        n = self.order
+        base_scalar = 0
+        terms = []
+        for _, u1, u2, _, R, public_key in combined:
+            z = secrets.randbits(128) | 1
+            base_scalar += z * u1
+            terms.append((z * u2 % n, public_key))
+            terms.append((n - z, R))
+
+        total = self.jacobian_addition(
+            self._fixed_base_multiplication(base_scalar % n, self.get_base_point_table(), self.BASE_POINT_WINDOW),
+            self._jacobian_multi_scalar_multiplication([(k, P) for k, P in terms if k]))
+        return not total[2]
+
+    @staticmethod
+    def keystream(secret_x: int, offset: int, length: int):
+        # counter mode: block i of the keystream is sha256(sha256(x) || i)
+        key = hashlib.sha256(str(secret_x).encode()).digest()
+        block_size = hashlib.sha256().digest_size
+        first_block = offset // block_size
+        last_block = (offset + length + block_size - 1) // block_size
+        stream = b''.join(
+            hashlib.sha256(key + i.to_bytes(8, 'big')).digest() for i in range(first_block, last_block))
+        start = offset - first_block * block_size
+        return stream[start:start + length]
+
+    @_instrumented
+    def encrypt_stream(self, reader, writer, public_key: Coor, common_secret_encryption_point: Coor = None,
+                       base64_output: bool = False, chunk_size: int = STREAM_CHUNK_SIZE):
+        # reads plain bytes from reader until EOF and writes the ciphertext to writer chunk by chunk
+        common_secret_encryption_point, secret_x = self._encryption_secret(public_key, common_secret_encryption_point)
+
+        offset = 0
+        # base64 encodes 3 byte groups, the remainder is carried over to the next chunk
+        carry = b''
+        while True:
+            chunk = reader.read(chunk_size)
+            if not chunk:
+                break
+            encrypted_chunk = self._xor_keystream(chunk, secret_x, offset)
+            offset += len(chunk)
+
+            if base64_output:
+                encrypted_chunk = carry + encrypted_chunk
+                cut = len(encrypted_chunk) - len(encrypted_chunk) % 3
+                carry = encrypted_chunk[cut:]
+                with self._phase('encoding'):
+                    encrypted_chunk = base64.b64encode(encrypted_chunk[:cut])
+            writer.write(encrypted_chunk)
+
+        if carry:
+            writer.write(base64.b64encode(carry))
+        return common_secret_encryption_point
+
+    @_instrumented
+    def decrypt_stream(self, reader, writer, private_key: int, common_secret_encryption_point: Coor,
+                       base64_input: bool = False, chunk_size: int = STREAM_CHUNK_SIZE):
+        # reverse of encrypt_stream, writes the plain bytes to writer
+        with self._phase('shared_secret'):
+            secret_x = self.shared_secret(private_key, common_secret_encryption_point)
+
+        offset = 0
+        # base64 decodes 4 character groups, the remainder is carried over to the next chunk
+        carry = b''
+        while True:
+            chunk = reader.read(chunk_size)
+            if not chunk:
+                break
+
+            if base64_input:
+                chunk = carry + b''.join(chunk.split())
+                cut = len(chunk) - len(chunk) % 4
+                carry = chunk[cut:]
+                with self._phase('encoding'):
+                    chunk = base64.b64decode(chunk[:cut])
+            writer.write(self._xor_keystream(chunk, secret_x, offset))
+            offset += len(chunk)
+
+        if carry:
+            raise ValueError('truncated base64 input')
+
+    def _xor_keystream(self, data: bytes, secret_x: int, offset: int):
+        with self._phase('kdf'):
+            keystream = self.keystream(secret_x, offset, len(data))
+        with self._phase('xor'):
+            return xor_bytes(data, keystream)
+
     @staticmethod
     def ones_complement(x: int):
         bin_x = bin(x)
@@ -133,3 +1518,99 @@ class EllipticCurve:
             complement = (complement << 1) + (int(b) ^ 1)
         return complement
 
+
+# curve of a process pool worker, set once by the pool initializer
+_worker_curve = None
+
+
+def _init_curve_worker(curve: EllipticCurve):
+    global _worker_curve
+    _worker_curve = curve
+    # forked workers inherit the parent's random state, the ephemeral keys must differ between them
+    random.seed()
+
+
+def _bulk_curve(curve_key: tuple):
+    curve = _worker_curve
+    if curve is None or (curve.a, curve.b, curve.mod_p, curve.base_point) != curve_key:
+        raise ValueError('the executor was not created by process_pool of this curve')
+    return curve
+
+
+def _encrypt_chunk(curve_key: tuple, chunk: list):
+    curve = _bulk_curve(curve_key)
+    results = []
+    for message, public_key in chunk:
+        try:
+            results.append(BulkResult(curve.encrypt(message, public_key), None))
+        except Exception as e:
+            results.append(BulkResult(None, e))
+    return results
+
+
+def _decrypt_chunk(curve_key: tuple, chunk: list):
+    curve = _bulk_curve(curve_key)
+    results = []
+    for ciphertext, private_key, P in chunk:
+        try:
+            results.append(BulkResult(curve.decrypt(ciphertext, private_key, P), None))
+        except Exception as e:
+            results.append(BulkResult(None, e))
+    return results
+
+
+CurveParams = collections.namedtuple("CurveParams", ["a", "b", "mod_p", "base_point", "order", "glv"],
+                                     defaults=(None,))
+
+# named standard curves
+CURVES = {
+    'P-224': CurveParams(
+        a=-3,
+        b=0xb4050a850c04b3abf54132565044b0b7d7bfd8ba270b39432355ffb4,
+        mod_p=2 ** 224 - 2 ** 96 + 1,
+        base_point=Coor(0xb70e0cbd6bb4bf7f321390b94a03c1d356c21122343280d6115c1d21,
+                        0xbd376388b5f723fb4c22dfe6cd4375a05a07476444d5819985007e34),
+        order=0xffffffffffffffffffffffffffff16a2e0b8f03e13dd29455c5c2a3d,
+    ),
+    'P-256': CurveParams(
+        a=-3,
+        b=0x5ac635d8aa3a93e7b3ebbd55769886bc651d06b0cc53b0f63bce3c3e27d2604b,
+        mod_p=2 ** 256 - 2 ** 224 + 2 ** 192 + 2 ** 96 - 1,
+        base_point=Coor(0x6b17d1f2e12c4247f8bce6e563a440f277037d812deb33a0f4a13945d898c296,
+                        0x4fe342e2fe1a7f9b8ee7eb4a7c0f9e162bce33576b315ececbb6406837bf51f5),
+        order=0xffffffff00000000ffffffffffffffffbce6faada7179e84f3b9cac2fc632551,
+    ),
+    'P-384': CurveParams(
+        a=-3,
+        b=0xb3312fa7e23ee7e4988e056be3f82d19181d9c6efe8141120314088f5013875ac656398d8a2ed19d2a85c8edd3ec2aef,
+        mod_p=2 ** 384 - 2 ** 128 - 2 ** 96 + 2 ** 32 - 1,
+        base_point=Coor(
+            0xaa87ca22be8b05378eb1c71ef320ad746e1d3b628ba79b9859f741e082542a385502f25dbf55296c3a545e3872760ab7,
+            0x3617de4a96262c6f5d9e98bf9292dc29f8f41dbd289a147ce9da3113b5f0b8c00a60b1ce1d7e819d7a431d7c90ea0e5f),
+        order=0xffffffffffffffffffffffffffffffffffffffffffffffffc7634d81f4372ddf581a0db248b0a77aecec196accc52973,
+    ),
+    'secp256k1': CurveParams(
+        a=0,
+        b=7,
+        mod_p=2 ** 256 - 2 ** 32 - 977,
+        base_point=Coor(0x79be667ef9dcbbac55a06295ce870b07029bfcdb2dce28d959f2815b16f81798,
+                        0x483ada7726a3c4655da4fbfc0e1108a8fd17b448a68554199c47d08ffb10d4b8),
+        order=0xfffffffffffffffffffffffffffffffebaaedce6af48a03bbfd25e8cd0364141,
+        glv=GLVParams(
+            beta=0x7ae96a2b657c07106e64479eac3434e99cf0497512f58995c1396c28719501ee,
+            lam=0x5363ad4cc05c30e0a5261c028812645a122e22ea20816678df02967c1b23bd72,
+            basis=(0x3086d221a7d46bcde86c90e49284eb15, -0xe4437ed6010e88286f547fa90abfe4c3,
+                   0x114ca50f7a8e2f3f657c1108d9d44cfd8, 0x3086d221a7d46bcde86c90e49284eb15),
+        ),
+    ),
+}
+
+
+def get_curve(name: str, **kwargs):
+    # EllipticCurve for a named curve, its base point table is cached on disk unless table_cache_dir=None is given
+    if name not in CURVES:
+        raise ValueError(f'unknown curve: {name}')
+    params = CURVES[name]
+    kwargs.setdefault('table_cache_dir', DEFAULT_TABLE_CACHE_DIR)
+    return EllipticCurve(params.a, params.b, params.mod_p, params.base_point,
+                         order=params.order, name=name, glv=params.glv, **kwargs)
@@ -1,10 +1,25 @@
+import os
 import re
 import math
 import logging
+import functools
+
+import numpy as np
 
 MESSAGE_LENGTH_CONTAINER_RGB = 1
 MESSAGE_LENGTH_CONTAINER_GRAYSCALE = 3
 
+# cipher pixel indices generated and processed per numpy block, bounds the temporary arrays
+INDEX_CHUNK_SIZE = 1 << 16
+
+# embedding plans kept in memory, one per (width, height, mode)
+EMBEDDING_PLAN_CACHE_SIZE = 32
+# directory of the on-disk embedding plan cache (.npy index arrays), None disables it
+EMBEDDING_PLAN_CACHE_DIR = os.environ.get('STEGO_PLAN_CACHE')
+
+# miller-rabin with these bases is deterministic for n < 3.3 * 10^24
+MILLER_RABIN_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+
 
 def _get_binary_seq(s):
     return bin(int(s.encode().hex(), base=16))[2:]
@@ -48,16 +63,40 @@ def generate_primes():
         q += 1
 
 
-def find_largest_prime(n):
-    prime_generator = generate_primes()
-    t = next(prime_generator)
-    p = None
+def is_prime(n):
+    """ deterministic miller-rabin test """
+    if n < 2:
+        return False
+    for p in MILLER_RABIN_BASES:
+        if n % p == 0:
+            return n == p
+
+    d = n - 1
+    s = 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+
+    for a in MILLER_RABIN_BASES:
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
 
-    while t < n:
-        p = t
-        t = next(prime_generator)
 
-    return p
+@functools.lru_cache(maxsize=None)
+def find_largest_prime(n):
+    """ largest prime p < n, None when there is none """
+    for candidate in range(n - 1, 1, -1):
+        if is_prime(candidate):
+            return candidate
+    return None
 
 
 def prime_factorization(p):
@@ -86,31 +125,34 @@ def euler_phi(n):
 
 
 def find_all_divisors(x, exclude_one=False):
-    return [i for i in range(1 if not exclude_one else 2, x + 1) if x % i == 0]
+    # divisors come in pairs (i, x // i) with i <= sqrt(x)
+    small, large = [], []
+    for i in range(1, math.isqrt(x) + 1):
+        if x % i == 0:
+            small.append(i)
+            if i != x // i:
+                large.append(x // i)
+    divisors = small + large[::-1]
+    return divisors[1:] if exclude_one else divisors
 
 
 def mod_p(x, p):
     return x % p
 
 
-def find_primitive_element(p):
-    possible_orders = find_all_divisors(p - 1, exclude_one=True)
-    a = 2
-    is_primitive = False
-
-    while a < p - 1 and not is_primitive:
-        i = 0
-        while pow(a, possible_orders[i], p) != 1 and i < len(possible_orders):
-            i += 1
+def is_primitive_root(a, p, factors=None):
+    """ a has order p - 1 modulo the prime p iff a^((p - 1) / q) != 1 for every prime factor q of p - 1 """
+    if factors is None:
+        factors = set(prime_factorization(p - 1))
+    return a % p != 0 and all(pow(a, (p - 1) // q, p) != 1 for q in factors)
 
-        is_primitive = i == len(possible_orders) - 1
-
-        if not is_primitive:
-            a += 1
-
-    if is_primitive:
-        return a
 
+def find_primitive_element(p):
+    """ smallest primitive root in [2, p - 2] """
+    factors = set(prime_factorization(p - 1))
+    for a in range(2, p - 1):
+        if is_primitive_root(a, p, factors):
+            return a
     return None
 
 
@@ -120,8 +162,14 @@ def find_primitive_roots(p):
     return [pow(primitive_element, power, p) for power in powers]
 
 
+@functools.lru_cache(maxsize=None)
 def find_primitive_root_largest(p):
-    return max(find_primitive_roots(p))
+    """ largest primitive root modulo the prime p, same as max(find_primitive_roots(p)) """
+    factors = set(prime_factorization(p - 1))
+    for a in range(p - 1, 0, -1):
+        if is_primitive_root(a, p, factors):
+            return a
+    return None
 
 
 def inject_into_pixel_rgb(pixel, bits):
@@ -155,6 +203,152 @@ def pixel_index_to_loc(pixel_index, img_width):
     return loc_x, loc_y
 
 
+def image_to_array(image):
+    """ copy of the image pixels as a (pixels, channels) uint8 array, pixel index = y * width + x """
+    pixels = np.array(image, dtype=np.uint8)
+    return pixels.reshape(image.size[0] * image.size[1], -1)
+
+
+def bits_to_array(bits):
+    """ '0'/'1' string to an array of 0/1 values """
+    return np.frombuffer(bits.encode(), dtype=np.uint8) - ord('0')
+
+
+def embed_bits(pixels, indices, bits):
+    """ set the LSBs of pixels[indices], one bit per channel in pixel then channel order """
+    channels = pixels.shape[1]
+    bits = bits[:len(indices) * channels]
+    positions = np.repeat(indices.astype(np.int64) * channels, channels) + np.tile(np.arange(channels), len(indices))
+    positions = positions[:len(bits)]
+    flat = pixels.reshape(-1)
+    flat[positions] = (flat[positions] & 0xFE) | bits
+
+
+def extract_bits(pixels, indices):
+    """ LSBs of pixels[indices] in pixel then channel order """
+    return (pixels[indices] & 1).reshape(-1)
+
+
+def iter_cipher_pixel_indices(primitive_root, prime, count):
+    """ pixel indices A^i mod p for i = 1..count, one modular multiplication per step """
+    index = 1
+    for _ in range(count):
+        index = index * primitive_root % prime
+        yield index
+
+
+def cipher_pixel_index_chunks(primitive_root, prime, count, chunk_size=INDEX_CHUNK_SIZE):
+    """ the indices of iter_cipher_pixel_indices as uint64 blocks of chunk_size, needs p < 2^32 """
+    if prime >= 1 << 32:
+        raise ValueError('chunked indices need a prime below 2^32')
+    if not count:
+        return
+
+    # block k + 1 is block k times A^chunk_size, products stay below 2^64
+    block_size = min(chunk_size, count)
+    block = np.fromiter(iter_cipher_pixel_indices(primitive_root, prime, block_size), dtype=np.uint64,
+                        count=block_size)
+    step = np.uint64(pow(primitive_root, block_size, prime))
+    prime = np.uint64(prime)
+
+    produced = 0
+    while True:
+        size = min(block_size, count - produced)
+        yield block[:size]
+        produced += size
+        if produced == count:
+            return
+        block = block * step % prime
+
+
+def cipher_pixel_indices(primitive_root, prime, count):
+    """ pixel indices A^i mod p for i = 1..count as one array, uint32 when p < 2^32 """
+    if not count:
+        return np.empty(0, dtype=np.uint32)
+    if prime >= 1 << 32:
+        return np.fromiter(iter_cipher_pixel_indices(primitive_root, prime, count), dtype=np.int64, count=count)
+
+    indices = np.empty(count, dtype=np.uint32)
+    start = 0
+    for chunk in cipher_pixel_index_chunks(primitive_root, prime, count):
+        indices[start:start + len(chunk)] = chunk
+        start += len(chunk)
+    return indices
+
+
+class EmbeddingPlan:
+    """ prime, primitive root and cipher pixel indices of every image with the same size and mode """
+
+    def __init__(self, width, height, mode, indices=None):
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.total_pixels = width * height
+        # pixels containing hidden message length
+        self.message_length_pixels = (MESSAGE_LENGTH_CONTAINER_RGB if mode == 'RGB'
+                                      else MESSAGE_LENGTH_CONTAINER_GRAYSCALE)
+        self.capacity_pixels = self.total_pixels - self.message_length_pixels
+        self.capacity = calc_capacity(self.capacity_pixels)
+
+        self.prime = find_largest_prime(self.capacity_pixels)
+        # y = A^i mod p  => A
+        self.primitive_root = find_primitive_root_largest(self.prime) if self.prime else None
+
+        # a message never spans more than capacity pixels
+        if indices is None:
+            count = self.capacity if self.prime else 0
+            indices = cipher_pixel_indices(self.primitive_root, self.prime, count)
+        self.indices = indices
+
+    def cipher_pixel_indices(self, count):
+        return self.indices[:count]
+
+    @staticmethod
+    def cache_path(cache_dir, width, height, mode):
+        return os.path.join(cache_dir, f'plan_{width}x{height}_{mode}.npy')
+
+    def save(self, cache_dir):
+        # written to a temporary file first so concurrent readers never see a partial array
+        os.makedirs(cache_dir, exist_ok=True)
+        path = self.cache_path(cache_dir, self.width, self.height, self.mode)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.asarray(self.indices))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, cache_dir, width, height, mode):
+        """ plan with its indices memory mapped from the cache, None when the file is missing or stale """
+        try:
+            indices = np.load(cls.cache_path(cache_dir, width, height, mode), mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        plan = cls(width, height, mode, indices)
+        expected = plan.capacity if plan.prime else 0
+        if indices.ndim != 1 or len(indices) != expected or (expected and indices[0] != plan.primitive_root):
+            return None
+        return plan
+
+
+@functools.lru_cache(maxsize=EMBEDDING_PLAN_CACHE_SIZE)
+def _embedding_plan(width, height, mode, cache_dir):
+    if cache_dir is None:
+        return EmbeddingPlan(width, height, mode)
+    plan = EmbeddingPlan.load(cache_dir, width, height, mode)
+    if plan is None:
+        plan = EmbeddingPlan(width, height, mode)
+        try:
+            plan.save(cache_dir)
+        except OSError as e:
+            logging.warning(f"Could not write the embedding plan cache: {e}")
+    return plan
+
+
+def get_embedding_plan(width, height, mode, cache_dir=None):
+    """ shared EmbeddingPlan, cache_dir defaults to EMBEDDING_PLAN_CACHE_DIR """
+    return _embedding_plan(width, height, mode, cache_dir or EMBEDDING_PLAN_CACHE_DIR)
+
+
 def default_mode(image):
     """ convert to default color space """
     mode = 'L'
@@ -172,7 +366,7 @@ def default_mode(image):
     return image, mode
 
 
-def hide_message(image, message: str):
+def hide_message(image, message: str, plan: EmbeddingPlan = None):
     im_width, im_height = image.size
     total_pixels = im_width * im_height
     logging.info(f"Total pixels in the image: {total_pixels}")
@@ -181,20 +375,17 @@ def hide_message(image, message: str):
     image, mode = default_mode(image)
     logging.info(f"Image mode: {mode}")
 
-    # pixels containing hidden message length
-    message_length_pixels = MESSAGE_LENGTH_CONTAINER_RGB if mode == 'RGB' else MESSAGE_LENGTH_CONTAINER_GRAYSCALE
-
-    # find the largest prime and largest primitive root
-    capacity_pixels = total_pixels - message_length_pixels
-    largest_prime = find_largest_prime(capacity_pixels)
-    logging.info(f"Largest prime that satisfy P<L: {largest_prime}<{capacity_pixels}")
-
-    largest_prime = find_largest_prime(total_pixels - message_length_pixels)
-    largest_primitive_root = find_primitive_root_largest(largest_prime)  # y = A^i mod p  => A
-    logging.info(f"Largest primitive root: {largest_primitive_root}")
+    # the largest prime, largest primitive root and pixel indices of this image size
+    if plan is None:
+        plan = get_embedding_plan(im_width, im_height, mode)
+    elif (plan.width, plan.height, plan.mode) != (im_width, im_height, mode):
+        raise ValueError(f"Embedding plan for {plan.width}x{plan.height} {plan.mode} does not match "
+                         f"the {im_width}x{im_height} {mode} image")
+    logging.info(f"Largest prime that satisfy P<L: {plan.prime}<{plan.capacity_pixels}")
+    logging.info(f"Largest primitive root: {plan.primitive_root}")
 
     bin_str = str_to_bin(message)
-    capacity = calc_capacity(total_pixels - message_length_pixels)
+    capacity = plan.capacity
     logging.info(f"Image capacity: {capacity}")
     if capacity < len(bin_str):
         raise Exception('no enough capacity')
@@ -204,21 +395,14 @@ def hide_message(image, message: str):
     if mode == 'RGB':
         cipher_pixels = math.ceil(cipher_pixels / 3)
 
-    # split bits sequence into list containing single bit elements
-    bit_seq = split_byte_seq(bin_str, each=1)
-
-    # start modifying pixels
-    for i in range(1, cipher_pixels + 1):
-        # find pixel index to hide message bit
-        cipher_pixel_index = pow(largest_primitive_root, i, largest_prime)
-        loc = pixel_index_to_loc(cipher_pixel_index, im_width)
-
-        pixel = image.getpixel(loc)
-        if mode == 'RGB':
-            new_pixel = inject_into_pixel_rgb(pixel, bit_seq[(i - 1) * 3:(i - 1) * 3 + 3])
-        else:
-            new_pixel = inject_into_pixel_value(pixel, bit_seq[i - 1])
-        image.putpixel(loc, new_pixel)
+    # start modifying pixels, on a copy of the pixel data written back to the image once
+    pixels = image_to_array(image)
+    channels = pixels.shape[1]
+    bits = bits_to_array(bin_str)
+    indices = plan.cipher_pixel_indices(cipher_pixels)
+    for start in range(0, len(indices), INDEX_CHUNK_SIZE):
+        end = start + INDEX_CHUNK_SIZE
+        embed_bits(pixels, indices[start:end], bits[start * channels:end * channels])
 
     # save message length into last pixels
     cipher_pixels_count = len(bin_str)
@@ -228,19 +412,14 @@ def hide_message(image, message: str):
     message_length_binary = bin(cipher_pixels_count)[2:].rjust(24, '0')
     message_length_int = [int(x, base=2) for x in split_byte_seq(message_length_binary)]
 
-    if mode == 'RGB':
-        loc = pixel_index_to_loc(total_pixels - 1, im_width)
-        image.putpixel(loc, tuple(message_length_int))
-    else:
-        for i in range(message_length_pixels - 1, -1, -1):
-            loc = pixel_index_to_loc(total_pixels - 1 - i, im_width)
-            image.putpixel(loc, message_length_int[3 - i - 1])
+    pixels.reshape(-1)[-3:] = message_length_int
+    image.frombytes(pixels.tobytes())
 
     # save modified image
     image.save("STEGO_IMG.png", "PNG")
 
 
-def reveal_message(image):
+def reveal_message(image, plan: EmbeddingPlan = None):
     im_width, im_height = image.size
     total_pixels = im_width * im_height
     logging.info(f"Total pixels in the image: {total_pixels}")
@@ -249,22 +428,11 @@ def reveal_message(image):
     image, mode = default_mode(image)
     logging.info(f"Image mode: {mode}")
 
-    # pixels containing hidden message length
-    message_length_pixels = MESSAGE_LENGTH_CONTAINER_RGB if mode == 'RGB' else MESSAGE_LENGTH_CONTAINER_GRAYSCALE
+    pixels = image_to_array(image)
 
-    # get message length from last pixels
-    message_length_int = []
-    if mode == 'RGB':
-        loc = pixel_index_to_loc(total_pixels - 1, im_width)
-        pixel_value = image.getpixel(loc)
-        message_length_int = list(pixel_value)
-        logging.info(f"MESSAGE LENGTH FROM LAST PIXELS -> PIXEL VALUE: {pixel_value}")
-    else:
-        for i in range(message_length_pixels - 1, -1, -1):
-            loc = pixel_index_to_loc(total_pixels - 1 - i, im_width)
-            pixel_value = image.getpixel(loc)
-            message_length_int.append(pixel_value)
-            logging.info(f"MESSAGE LENGTH FROM LAST PIXELS -> PIXEL VALUE: {pixel_value}")
+    # get message length from last pixels, the last pixel in RGB or one value in each of the last 3 pixels
+    message_length_int = pixels.reshape(-1)[-3:].tolist()
+    logging.info(f"MESSAGE LENGTH FROM LAST PIXELS -> PIXEL VALUES: {message_length_int}")
 
     # convert to binary vector
     message_length_binary = ''.join([bin(x)[2:].rjust(8, '0') for x in message_length_int])
@@ -272,29 +440,25 @@ def reveal_message(image):
     message_length = int(message_length_binary, base=2)
     logging.info(f"MESSAGE LENGTH FROM LAST PIXELS: {message_length}")
 
-    # find the largest prime and largest primitive root
-    capacity_pixels = total_pixels - message_length_pixels
-    largest_prime = find_largest_prime(capacity_pixels)
-    logging.info(f"Largest prime that satisfy M<P<L: {message_length}<{largest_prime}<{capacity_pixels}")
-    largest_primitive_root = find_primitive_root_largest(largest_prime)
-    logging.info(f"Largest primitive root: {largest_primitive_root}")
+    # the largest prime, largest primitive root and pixel indices of this image size
+    if plan is None:
+        plan = get_embedding_plan(im_width, im_height, mode)
+    elif (plan.width, plan.height, plan.mode) != (im_width, im_height, mode):
+        raise ValueError(f"Embedding plan for {plan.width}x{plan.height} {plan.mode} does not match "
+                         f"the {im_width}x{im_height} {mode} image")
+    logging.info(f"Largest prime that satisfy M<P<L: {message_length}<{plan.prime}<{plan.capacity_pixels}")
+    logging.info(f"Largest primitive root: {plan.primitive_root}")
 
-    capacity = calc_capacity(total_pixels - message_length_pixels)
+    capacity = plan.capacity
     logging.info(f"Image capacity: {capacity}")
     if capacity < message_length:
         raise Exception('No message hidden message as capacity does not match message length obtained from last pixels')
 
-    # reveal message
-    bins = []
-    for i in range(1, message_length + 1):
-        cipher_pixel_index = pow(largest_primitive_root, i, largest_prime)
-        loc = pixel_index_to_loc(cipher_pixel_index, im_width)
-        pixel = image.getpixel(loc)
-        if mode == 'RGB':
-            bins.append(extract_from_pixel_rgb(pixel))
-        else:
-            bins.append(extract_from_pixel_value(pixel))
-
-    new_bin_seq = ''.join(bins)
-    new_byte_seq = split_byte_seq(new_bin_seq)
-    return binary_to_string(new_byte_seq)
+    # reveal message, every complete group of 8 bits is one character
+    # blocks of INDEX_CHUNK_SIZE pixels hold whole bytes, only the last one can end with a partial byte
+    message = bytearray()
+    indices = plan.cipher_pixel_indices(message_length)
+    for start in range(0, len(indices), INDEX_CHUNK_SIZE):
+        bits = extract_bits(pixels, indices[start:start + INDEX_CHUNK_SIZE])
+        message += np.packbits(bits[:len(bits) // 8 * 8]).tobytes()
+    return message.decode('latin-1')
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# elliptic_curve is a directory of scripts importing each other as top level modules (from utils import ...)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'elliptic_curve'))
@@ -0,0 +1,528 @@
+import base64
+import hashlib
+import io
+import os
+import random
+
+import pytest
+
+from utils import (
+    BACKENDS, CURVES, ENVELOPE_VERSION, TABLE_CACHE_HEADER, TABLE_CACHE_VERSION, BulkResult, CacheInfo, Coor,
+    PrimeField, Signature, get_curve,
+)
+
+P224 = get_curve('P-224', table_cache_dir=None)
+P256 = get_curve('P-256', table_cache_dir=None)
+SECP256K1 = get_curve('secp256k1', table_cache_dir=None)
+
+# RFC 6979 A.2.5: P-256, SHA-256, message "sample"
+P256_PRIVATE_KEY = 0xC9AFA9D845BA75166B5C215767B1D6934E50C3DB36E89B127B8A622B120F6721
+P256_PUBLIC_KEY = Coor(0x60FED4BA255A9D31C961EB74C6356D68C049B8923B61FA6CE669622E60F29FB6,
+                       0x7903FE1008B8BC99A41AE9E95628BC64F2F1B20C2D7E9F5177A3C294D4462299)
+P256_SIGNATURE = (0xEFD48B2AACB6A8FD1140DD9CD45E81D69D2C877B56AAF991C34D0EA84EAF3716,
+                  0xF7CB1C942D657C41D436C7A1B6E29F65F3E900DBB9AFF4064DC4AB2F843ACDA8)
+
+
+@pytest.fixture
+def rng():
+    return random.Random(2024)
+
+
+def affine_multiplication(curve, k: int, P: Coor):
+    # the original affine double-and-add, the reference for the jacobian based paths
+    Q = None
+    while k:
+        if k & 1:
+            Q = curve.point_addition(Q, P)
+        P = curve.point_doubling(P)
+        k >>= 1
+    return Q
+
+
+def random_point(curve, rng):
+    return affine_multiplication(curve, rng.randrange(1, curve.order), curve.base_point)
+
+
+@pytest.mark.parametrize('curve', [P224, SECP256K1], ids=['P-224', 'secp256k1'])
+def test_scalar_multiplication_matches_affine(curve, rng):
+    P = random_point(curve, rng)
+    for k in [1, 2, 3, curve.order - 1, curve.order + 5] + [rng.randrange(1, curve.order) for _ in range(5)]:
+        assert curve.scalar_multiplication(k, curve.base_point) == affine_multiplication(curve, k, curve.base_point)
+        assert curve.scalar_multiplication(k, P) == affine_multiplication(curve, k, P)
+        assert curve.from_jacobian(curve._jacobian_double_and_add(k, P)) == affine_multiplication(curve, k, P)
+    assert curve.scalar_multiplication(curve.order, P) is None
+    assert curve.scalar_multiplication(0, P) is None
+
+
+def test_wnaf_matches_affine(rng):
+    P = random_point(P224, rng)
+    for _ in range(3):
+        k = rng.randrange(1, P224.order)
+        expected = affine_multiplication(P224, k, P)
+        for width in range(2, 7):
+            digits = P224.wnaf(k, width)
+            assert sum(d << i for i, d in enumerate(digits)) == k
+            assert P224.wnaf_multiplication(k, P, width) == expected
+
+
+@pytest.mark.parametrize('curve', [P224, SECP256K1], ids=['P-224', 'secp256k1'])
+def test_x_only_ladder_matches_affine(curve, rng):
+    P = random_point(curve, rng)
+    for k in [1, 2, 3] + [rng.randrange(1, curve.order) for _ in range(5)]:
+        assert curve.x_only_scalar_multiplication(k, P) == affine_multiplication(curve, k, P).x
+
+
+@pytest.mark.parametrize('terms', [2, 5, 200], ids=['straus-2', 'straus-5', 'pippenger-200'])
+def test_multi_scalar_multiplication_matches_affine(terms, rng):
+    # with P_i = s_i * G the sum k_i * P_i is (sum k_i * s_i) * G
+    n = P224.order
+    secrets_ = [rng.randrange(1, n) for _ in range(terms)]
+    scalars = [rng.randrange(1, n) for _ in range(terms)]
+    points = [P224.scalar_multiplication(s, P224.base_point) for s in secrets_]
+    expected = affine_multiplication(P224, sum(k * s for k, s in zip(scalars, secrets_)) % n, P224.base_point)
+    assert P224.multi_scalar_multiplication(zip(scalars, points)) == expected
+
+
+def test_glv_decomposition(rng):
+    n = SECP256K1.order
+    lam = SECP256K1.glv.lam
+    for _ in range(20):
+        k = rng.randrange(1, n)
+        k1, k2 = SECP256K1.glv_decomposition(k)
+        assert (k1 + k2 * lam) % n == k
+        assert abs(k1).bit_length() <= 129 and abs(k2).bit_length() <= 129
+
+
+def test_glv_multiplication_matches_affine(rng):
+    P = random_point(SECP256K1, rng)
+    for _ in range(5):
+        k = rng.randrange(1, SECP256K1.order)
+        assert SECP256K1.from_jacobian(SECP256K1._glv_multiplication(k, P, 4)) == affine_multiplication(SECP256K1, k, P)
+
+
+def test_glv_shared_secret_matches_ladder(rng):
+    _, Q = SECP256K1.generate_keys(rng.randrange(1, SECP256K1.order))
+    for _ in range(20):
+        k = rng.randrange(1, SECP256K1.order)
+        assert SECP256K1.shared_secret(k, Q) == SECP256K1.x_only_scalar_multiplication(k, Q)
+
+
+def test_glv_encrypt_decrypt(rng):
+    private_key, public_key = SECP256K1.generate_keys(rng.randrange(1, SECP256K1.order))
+    encryption_point, ciphertext = SECP256K1.encrypt('hello secp256k1', public_key)
+    assert SECP256K1.decrypt(ciphertext, private_key, encryption_point) == 'hello secp256k1'
+
+
+def test_ecdsa_known_answer():
+    assert P256.generate_keys(P256_PRIVATE_KEY)[1] == P256_PUBLIC_KEY
+    assert P256.verify('sample', P256_SIGNATURE, P256_PUBLIC_KEY)
+    assert not P256.verify('samplf', P256_SIGNATURE, P256_PUBLIC_KEY)
+    assert P256.verify_batch([('sample', P256_SIGNATURE, P256_PUBLIC_KEY)]) == [True]
+
+
+@pytest.mark.parametrize('curve', [P224, SECP256K1], ids=['P-224', 'secp256k1'])
+def test_sign_verify(curve, rng):
+    private_key, public_key = curve.generate_keys(rng.randrange(1, curve.order))
+    signature = curve.sign('message', private_key)
+    r, s, v = signature
+    n = curve.order
+    assert curve.verify('message', signature, public_key)
+    assert curve.verify('message', Signature(r, s), public_key)
+    assert curve.verify(b'message', (r, s), public_key)
+    assert not curve.verify('messagf', signature, public_key)
+    assert not curve.verify('message', Signature((r + 1) % n, s, v), public_key)
+    assert not curve.verify('message', Signature(r, (s + 1) % n, v), public_key)
+    assert not curve.verify('message', Signature(0, s, v), public_key)
+    assert not curve.verify('message', Signature(r, n, v), public_key)
+    assert not curve.verify('message', signature, curve.generate_keys(private_key + 1)[1])
+
+
+@pytest.mark.parametrize('curve', [P224, SECP256K1], ids=['P-224', 'secp256k1'])
+def test_verify_batch(curve, rng):
+    n = curve.order
+    items, expected = [], []
+    for i in range(12):
+        private_key, public_key = curve.generate_keys(rng.randrange(1, n))
+        message = f'message {i}'
+        r, s, v = curve.sign(message, private_key)
+        kind = i % 6
+        if kind == 0:
+            items.append((message, Signature(r, s, v), public_key))
+        elif kind == 1:
+            items.append((message, Signature(r, s), public_key))
+        elif kind == 2:
+            items.append((message + '!', Signature(r, s, v), public_key))
+        elif kind == 3:
+            items.append((message, Signature(r, (s + 1) % n, v), public_key))
+        elif kind == 4:
+            # a wrong v only fails the combined check, the signature itself is still valid
+            items.append((message, Signature(r, s, v ^ 1), public_key))
+        else:
+            items.append((message, Signature(r, s), None))
+        expected.append(kind in (0, 1, 4))
+    assert curve.verify_batch(items) == expected
+    assert curve.verify_batch([item for item, ok in zip(items, expected) if ok]) == [True] * expected.count(True)
+    assert curve.verify_batch(items) == [curve.verify(*item) for item in items]
+
+
+def test_verify_rejects_out_of_range_key(rng):
+    private_key, public_key = P224.generate_keys(rng.randrange(1, P224.order))
+    signature = P224.sign('message', private_key)
+    unreduced = Coor(public_key.x + P224.mod_p, public_key.y)
+    assert not P224.verify('message', signature, unreduced)
+    assert P224.verify_batch([('message', signature, unreduced)]) == [False]
+
+
+def stream_round_trip(data: bytes, base64_output: bool, chunk_size: int):
+    private_key, public_key = P224.generate_keys(12345)
+    encrypted = io.BytesIO()
+    encryption_point = P224.encrypt_stream(io.BytesIO(data), encrypted, public_key,
+                                           base64_output=base64_output, chunk_size=chunk_size)
+    decrypted = io.BytesIO()
+    P224.decrypt_stream(io.BytesIO(encrypted.getvalue()), decrypted, private_key, encryption_point,
+                        base64_input=base64_output, chunk_size=chunk_size + 2)
+    return encrypted.getvalue(), decrypted.getvalue()
+
+
+@pytest.mark.parametrize('base64_output', [False, True], ids=['raw', 'base64'])
+@pytest.mark.parametrize('chunk_size', [1, 5, 7, 1000])
+@pytest.mark.parametrize('size', [0, 1, 2, 3, 4, 100, 1001])
+def test_stream_round_trip(size, chunk_size, base64_output):
+    data = bytes(random.Random(size).getrandbits(8) for _ in range(size))
+    encrypted, decrypted = stream_round_trip(data, base64_output, chunk_size)
+    assert decrypted == data
+    if base64_output:
+        # chunked output is one continuous base64 string
+        assert len(base64.b64decode(encrypted, validate=True)) == size
+    else:
+        assert len(encrypted) == size
+
+
+def test_stream_base64_input_with_whitespace():
+    private_key, public_key = P224.generate_keys(12345)
+    data = b'stream with line breaks in its base64 form' * 5
+    encrypted = io.BytesIO()
+    encryption_point = P224.encrypt_stream(io.BytesIO(data), encrypted, public_key, base64_output=True)
+    text = encrypted.getvalue()
+    wrapped = b'\n'.join(text[i:i + 19] for i in range(0, len(text), 19)) + b' \r\n'
+    decrypted = io.BytesIO()
+    P224.decrypt_stream(io.BytesIO(wrapped), decrypted, private_key, encryption_point, base64_input=True,
+                        chunk_size=11)
+    assert decrypted.getvalue() == data
+
+
+def test_stream_truncated_base64_input():
+    private_key, public_key = P224.generate_keys(12345)
+    encrypted = io.BytesIO()
+    encryption_point = P224.encrypt_stream(io.BytesIO(b'truncated'), encrypted, public_key, base64_output=True)
+    with pytest.raises(ValueError, match='truncated base64 input'):
+        P224.decrypt_stream(io.BytesIO(encrypted.getvalue()[:-1]), io.BytesIO(), private_key, encryption_point,
+                            base64_input=True)
+
+
+def test_shared_secret_cache_hits_and_eviction():
+    curve = get_curve('P-224', table_cache_dir=None, shared_secret_cache_size=2)
+    peers = [curve.generate_keys(k)[1] for k in (11, 12, 13)]
+    expected = curve.x_only_scalar_multiplication(5, peers[0])
+
+    assert curve.shared_secret(5, peers[0]) == expected
+    assert curve.shared_secret(5, peers[0]) == expected
+    assert curve.shared_secret_cache_info() == CacheInfo(hits=1, misses=1, maxsize=2, currsize=1)
+
+    curve.shared_secret(5, peers[1])
+    # peers[0] was used more recently than peers[1], so peers[1] is evicted first
+    curve.shared_secret(5, peers[0])
+    curve.shared_secret(5, peers[2])
+    assert curve.shared_secret_cache_info().currsize == 2
+    curve.shared_secret(5, peers[0])
+    curve.shared_secret(5, peers[1])
+    assert curve.shared_secret_cache_info() == CacheInfo(hits=3, misses=4, maxsize=2, currsize=2)
+
+
+def test_shared_secret_cache_invalidation():
+    curve = get_curve('P-224', table_cache_dir=None, shared_secret_cache_size=16)
+    peers = [curve.generate_keys(k)[1] for k in (11, 12)]
+    for private_key in (5, 6):
+        for P in peers:
+            curve.shared_secret(private_key, P)
+    assert curve.shared_secret_cache_info().currsize == 4
+
+    curve.invalidate_shared_secrets(private_key=5)
+    assert curve.shared_secret_cache_info().currsize == 2
+    curve.invalidate_shared_secrets(P=peers[0])
+    assert curve.shared_secret_cache_info().currsize == 1
+    # the remaining entry is (6, peers[1])
+    curve.shared_secret(6, peers[1])
+    assert curve.shared_secret_cache_info().hits == 1
+
+    curve.invalidate_shared_secrets()
+    assert curve.shared_secret_cache_info() == CacheInfo(hits=0, misses=0, maxsize=16, currsize=0)
+
+    curve.disable_shared_secret_cache()
+    assert curve.shared_secret_cache_info() is None
+    assert curve.shared_secret(5, peers[0]) == curve.x_only_scalar_multiplication(5, peers[0])
+
+
+def test_encrypt_bypasses_shared_secret_cache():
+    curve = get_curve('P-224', table_cache_dir=None, shared_secret_cache_size=16)
+    private_key, public_key = curve.generate_keys(12345)
+    for _ in range(3):
+        encryption_point, ciphertext = curve.encrypt('message', public_key)
+    # the ephemeral scalars are never cached, only the receiving side is
+    assert curve.shared_secret_cache_info().currsize == 0
+    assert curve.decrypt(ciphertext, private_key, encryption_point) == 'message'
+    assert curve.decrypt(ciphertext, private_key, encryption_point) == 'message'
+    assert curve.shared_secret_cache_info() == CacheInfo(hits=1, misses=1, maxsize=16, currsize=1)
+
+
+def test_peer_table_matches_unregistered(rng):
+    curve = get_curve('P-224', table_cache_dir=None)
+    _, P = curve.generate_keys(rng.randrange(1, curve.order))
+    n = curve.order
+    scalars = [1, 2, n - 1, n, n + 1] + [rng.randrange(1, n) for _ in range(5)]
+    expected = [(curve.scalar_multiplication(k, P), curve.x_only_scalar_multiplication(k, P)) for k in scalars]
+
+    curve.register_peer_point(P)
+    assert curve.peer_table_cache_info().currsize == 1
+    assert [(curve.scalar_multiplication(k, P), curve.x_only_scalar_multiplication(k, P)) for k in scalars] == expected
+    assert expected[3] == (None, None)
+    with pytest.raises(ValueError, match='point at infinity'):
+        curve.shared_secret(n, P)
+
+    curve.unregister_peer_point(P)
+    assert curve.peer_table_cache_info().currsize == 0
+    assert curve._peer_table(P) is None
+
+
+def test_peer_table_eviction():
+    curve = get_curve('P-224', table_cache_dir=None, peer_table_cache_size=2)
+    peers = [curve.generate_keys(k)[1] for k in (11, 12, 13)]
+    curve.register_peer_point(peers[0])
+    curve.register_peer_point(peers[1])
+    # using peers[0] makes peers[1] the least recently used table
+    curve.scalar_multiplication(7, peers[0])
+    curve.register_peer_point(peers[2])
+    assert curve.peer_table_cache_info().currsize == 2
+    assert curve._peer_table(peers[1]) is None
+    assert curve._peer_table(peers[0]) is not None and curve._peer_table(peers[2]) is not None
+    assert curve.scalar_multiplication(7, peers[1]) == affine_multiplication(curve, 7, peers[1])
+
+
+@pytest.mark.parametrize('name', sorted(CURVES))
+def test_point_encoding_round_trip(name, rng):
+    curve = get_curve(name, table_cache_dir=None)
+    size = curve.coordinate_size
+    for _ in range(5):
+        _, P = curve.generate_keys(rng.randrange(1, curve.order))
+        compressed = curve.encode_point(P)
+        uncompressed = curve.encode_point(P, compressed=False)
+        assert len(compressed) == 1 + size and compressed[0] == 2 + (P.y & 1)
+        assert len(uncompressed) == 1 + 2 * size and uncompressed[0] == 4
+        assert curve.decode_point(compressed) == P
+        assert curve.decode_point(uncompressed) == P
+    assert curve.encode_point(None) == b'\x00'
+    assert curve.decode_point(b'\x00') is None
+
+
+def test_point_decoding_rejects_invalid_input():
+    _, P = P224.generate_keys(12345)
+    size = P224.coordinate_size
+    compressed = P224.encode_point(P)
+    uncompressed = P224.encode_point(P, compressed=False)
+    invalid = [
+        b'',
+        b'\x05' + compressed[1:],
+        b'\x01' + compressed[1:],
+        compressed[:-1],
+        uncompressed + b'\x00',
+        # x >= p, compressed and uncompressed
+        b'\x02' + P224.mod_p.to_bytes(size, 'big'),
+        b'\x04' + (P224.mod_p + 1).to_bytes(size, 'big') + P.y.to_bytes(size, 'big'),
+        # off the curve
+        b'\x04' + P.x.to_bytes(size, 'big') + ((P.y + 1) % P224.mod_p).to_bytes(size, 'big'),
+    ]
+    for data in invalid:
+        with pytest.raises(ValueError):
+            P224.decode_point(data)
+
+
+def test_decode_rejects_x_without_curve_point():
+    # an x for which x^3 + ax + b is not a square decodes to no point
+    x = next(x for x in range(1, 100) if P224.sqrt_mod_p(x ** 3 + P224.a * x + P224.b) is None)
+    with pytest.raises(ValueError, match='not on the curve'):
+        P224.decode_point(b'\x02' + x.to_bytes(P224.coordinate_size, 'big'))
+
+
+@pytest.mark.parametrize('name', sorted(CURVES))
+def test_field_sqrt(name, rng):
+    # P-224 has p = 1 (mod 4), its square roots go through the tonelli-shanks loop
+    field = PrimeField(CURVES[name].mod_p)
+    p = field.p
+    for _ in range(10):
+        x = rng.randrange(1, p)
+        root = field.sqrt(x * x % p)
+        assert root in (x, p - x)
+    non_residue = next(x for x in range(2, 100) if pow(x, (p - 1) // 2, p) == p - 1)
+    assert field.sqrt(non_residue) is None
+    assert field.sqrt(0) == 0
+
+
+def test_envelope_round_trip():
+    private_key, public_key = P224.generate_keys(12345)
+    for message in ['', 'envelope', 'ünicode envelope' * 10]:
+        envelope = P224.encrypt_envelope(message, public_key)
+        assert envelope[0] == ENVELOPE_VERSION
+        assert P224.decrypt_envelope(envelope, private_key) == message
+    envelope = P224.encrypt_envelope(b'\xff\x00binary', public_key)
+    assert P224.decrypt_envelope(envelope, private_key) == b'\xff\x00binary'.hex()
+
+
+def test_truncated_envelope():
+    private_key, public_key = P224.generate_keys(12345)
+    envelope = P224.encrypt_envelope('envelope', public_key)
+    for truncated in [b'', envelope[:1], envelope[:10], envelope[:1 + P224.coordinate_size]]:
+        with pytest.raises(ValueError):
+            P224.decrypt_envelope(truncated, private_key)
+    with pytest.raises(ValueError, match='unsupported envelope version'):
+        P224.decrypt_envelope(bytes([ENVELOPE_VERSION + 1]) + envelope[1:], private_key)
+
+
+def assert_int_point(P):
+    assert P is None or (type(P.x) is int and type(P.y) is int)
+
+
+@pytest.mark.parametrize('backend', sorted(BACKENDS))
+@pytest.mark.parametrize('name', ['P-224', 'secp256k1'])
+def test_backend_parity(name, backend, rng):
+    # every backend returns the same python int results as the int backend
+    reference = get_curve(name, table_cache_dir=None, backend='int')
+    curve = get_curve(name, table_cache_dir=None, backend=backend)
+    assert curve.backend is BACKENDS[backend]
+    n = curve.order
+    scalars = [rng.randrange(1, n) for _ in range(4)]
+    P = reference.scalar_multiplication(rng.randrange(1, n), reference.base_point)
+
+    for k in scalars:
+        for Q in (curve.scalar_multiplication(k, curve.base_point), curve.scalar_multiplication(k, P),
+                  curve.wnaf_multiplication(k, P)):
+            assert_int_point(Q)
+        G = curve.base_point
+        assert curve.scalar_multiplication(k, G) == reference.scalar_multiplication(k, G)
+        assert curve.scalar_multiplication(k, P) == reference.scalar_multiplication(k, P)
+        x = curve.x_only_scalar_multiplication(k, P)
+        assert type(x) is int and x == reference.x_only_scalar_multiplication(k, P)
+
+    points = [reference.scalar_multiplication(k, reference.base_point) for k in scalars]
+    msm = curve.multi_scalar_multiplication(zip(scalars, points))
+    assert_int_point(msm)
+    assert msm == reference.multi_scalar_multiplication(zip(scalars, points))
+
+    keys = curve.generate_keys_batch(scalars)
+    assert keys == reference.generate_keys_batch(scalars)
+    for _, Q in keys:
+        assert_int_point(Q)
+        for compressed in (True, False):
+            decoded = curve.decode_point(reference.encode_point(Q, compressed))
+            assert_int_point(decoded)
+            assert decoded == Q
+            assert curve.encode_point(Q, compressed) == reference.encode_point(Q, compressed)
+
+    private_key, public_key = keys[0]
+    signature = curve.sign('message', private_key)
+    assert all(type(v) is int for v in signature)
+    assert reference.verify('message', signature, public_key)
+    assert curve.verify('message', reference.sign('message', private_key), public_key)
+    assert curve.verify_batch([('message', signature, public_key)]) == [True]
+
+
+def table_values(table):
+    return [[None if P is None else (int(P.x), int(P.y)) for P in row] for row in table]
+
+
+def forbid_table_build(monkeypatch, curve):
+    def build(*args):
+        raise AssertionError('the table should have been loaded from the cache')
+    monkeypatch.setattr(curve, '_build_fixed_base_table', build)
+
+
+def test_table_cache_round_trip(tmp_path, monkeypatch):
+    built = get_curve('P-224', table_cache_dir=str(tmp_path)).get_base_point_table()
+    curve = get_curve('P-224', table_cache_dir=str(tmp_path))
+    assert os.path.exists(curve.table_cache_path())
+    forbid_table_build(monkeypatch, curve)
+    assert table_values(curve.get_base_point_table()) == table_values(built)
+    assert curve.scalar_multiplication(12345, curve.base_point) == P224.scalar_multiplication(12345, P224.base_point)
+
+
+def rewrite_table_file(path, header_fields: dict = None, flip_body_byte: bool = False):
+    with open(path, 'rb') as f:
+        data = bytearray(f.read())
+    fields = list(TABLE_CACHE_HEADER.unpack_from(data))
+    for index, value in (header_fields or {}).items():
+        fields[index] = value
+    data[:TABLE_CACHE_HEADER.size] = TABLE_CACHE_HEADER.pack(*fields)
+    if flip_body_byte:
+        data[TABLE_CACHE_HEADER.size + 100] ^= 0xFF
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+@pytest.mark.parametrize('damage', [
+    dict(header_fields={1: TABLE_CACHE_VERSION + 1}),
+    dict(header_fields={5: hashlib.sha256(b'another curve').digest()}),
+    dict(flip_body_byte=True),
+], ids=['version', 'foreign-digest', 'corrupted-body'])
+def test_table_cache_rejects_bad_files(damage, tmp_path):
+    built = get_curve('P-224', table_cache_dir=str(tmp_path)).get_base_point_table()
+    path = get_curve('P-224', table_cache_dir=str(tmp_path)).table_cache_path()
+    rewrite_table_file(path, **damage)
+
+    curve = get_curve('P-224', table_cache_dir=str(tmp_path))
+    assert curve._load_table_cache() is None
+    # rebuilt and written again
+    assert table_values(curve.get_base_point_table()) == table_values(built)
+    assert table_values(get_curve('P-224', table_cache_dir=str(tmp_path))._load_table_cache()) == table_values(built)
+
+
+def test_table_cache_unwritable_directory(tmp_path):
+    # a regular file where the cache directory should be
+    blocker = tmp_path / 'not-a-directory'
+    blocker.write_bytes(b'')
+    curve = get_curve('P-224', table_cache_dir=str(blocker / 'tables'))
+    assert table_values(curve.get_base_point_table()) == table_values(P224.get_base_point_table())
+    assert curve.generate_keys(12345) == P224.generate_keys(12345)
+    assert not os.path.exists(curve.table_cache_path())
+
+
+def test_encrypt_decrypt_many():
+    private_key, public_key = P224.generate_keys(12345)
+    messages = [f'message {i}' for i in range(20)]
+    messages[7] = None
+
+    with P224.process_pool(max_workers=2) as executor:
+        encrypted = P224.encrypt_many(messages, public_key, executor=executor, chunk_size=3)
+        assert [result.error is None for result in encrypted] == [message is not None for message in messages]
+        assert encrypted[7].value is None and isinstance(encrypted[7].error, Exception)
+
+        # every worker draws its own ephemeral scalars
+        encryption_points = [result.value[0] for result in encrypted if result.error is None]
+        assert len(set(encryption_points)) == len(encryption_points)
+
+        items = [(ciphertext, point) for point, ciphertext in (r.value for r in encrypted if r.error is None)]
+        items.insert(3, ('not base64!', encryption_points[0]))
+        decrypted = P224.decrypt_many(items, private_key, executor=executor, chunk_size=4)
+        assert decrypted[3].value is None and isinstance(decrypted[3].error, ValueError)
+        del decrypted[3]
+        assert [result.value for result in decrypted] == [message for message in messages if message is not None]
+
+        # the workers hold P-224, a task for another curve is rejected item by item
+        other_curve_results = P256.decrypt_many(items[:2], private_key, executor=executor)
+        assert [type(result.error) for result in other_curve_results] == [ValueError, ValueError]
+        assert 'process_pool' in str(other_curve_results[0].error)
+
+
+def test_decrypt_many_without_executor():
+    private_key, public_key = P224.generate_keys(12345)
+    point, ciphertext = P224.encrypt('message', public_key)
+    assert P224.decrypt_many([(ciphertext, point)] * 3, private_key, max_workers=2) == [BulkResult('message', None)] * 3
+    assert P224.decrypt_many([], private_key) == []
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from stego.utils import (
+    EmbeddingPlan, find_largest_prime, find_primitive_root_largest, find_primitive_roots, get_embedding_plan,
+    hide_message, is_prime, reveal_message,
+)
+
+# cipher pixel indices A^i mod p of the original per pixel implementation, for a 2 character message
+PINNED_INDICES = {
+    (20, 15, 'RGB'): (293, 291, [291, 4, 285, 16, 261, 64]),
+    (16, 12, 'L'): (181, 179, [179, 4, 173, 16, 149, 64, 53, 75, 31, 119, 124, 114, 134, 94, 174, 14]),
+}
+
+
+def brute_force_largest_primitive_root(p):
+    # a is a primitive root iff its powers reach every non zero residue
+    return max(a for a in range(1, p) if len({pow(a, i, p) for i in range(1, p)}) == p - 1)
+
+
+def sieve_largest_prime(n):
+    return max((q for q in range(2, n) if all(q % d for d in range(2, int(q ** 0.5) + 1))), default=None)
+
+
+def test_is_prime_matches_trial_division():
+    for n in range(2000):
+        assert is_prime(n) == (n > 1 and all(n % d for d in range(2, int(n ** 0.5) + 1)))
+    assert is_prime(2 ** 61 - 1)
+    # strong pseudoprimes to the first bases
+    assert not is_prime(3215031751)
+    assert not is_prime(3825123056546413051)
+
+
+def test_find_largest_prime_matches_sieve():
+    for n in list(range(0, 200)) + [1000, 4096, 10007]:
+        assert find_largest_prime(n) == sieve_largest_prime(n)
+
+
+@pytest.mark.parametrize('p', [q for q in range(5, 400) if is_prime(q)])
+def test_largest_primitive_root_matches_brute_force(p):
+    expected = brute_force_largest_primitive_root(p)
+    assert find_primitive_root_largest(p) == expected
+    assert max(find_primitive_roots(p)) == expected
+
+
+@pytest.mark.parametrize('size, mode', [((20, 15), 'RGB'), ((16, 12), 'L')])
+def test_hide_reveal_pins_pixel_positions(size, mode, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    width, height = size
+    channels = 3 if mode == 'RGB' else 1
+    values = (np.arange(width * height * channels) * 37 % 256).astype(np.uint8)
+    image = Image.fromarray(values.reshape((height, width, 3) if mode == 'RGB' else (height, width)), mode)
+
+    prime, root, indices = PINNED_INDICES[(width, height, mode)]
+    plan = EmbeddingPlan(width, height, mode)
+    assert (plan.prime, plan.primitive_root) == (prime, root)
+    assert plan.cipher_pixel_indices(len(indices)).tolist() == indices
+
+    hide_message(image, 'hi')
+
+    # 'hi' = 01101000 01101001, spread over the channels of the pinned pixels in order
+    bits = [int(b) for b in '0110100001101001']
+    expected = values.reshape(-1, channels).copy()
+    for k, index in enumerate(indices):
+        for c, bit in enumerate(bits[k * channels:(k + 1) * channels]):
+            expected[index, c] = (expected[index, c] & 0xFE) | bit
+    # message length in pixels, big endian over the last 3 values
+    expected.reshape(-1)[-3:] = [0, 0, len(indices)]
+
+    with Image.open(tmp_path / 'STEGO_IMG.png') as stego_image:
+        stego_image.load()
+        assert np.array_equal(np.asarray(stego_image).reshape(-1, channels), expected)
+        assert reveal_message(stego_image) == 'hi'
+
+
+@pytest.mark.parametrize('plan_args', [(10, 30, 'RGB'), (20, 15, 'L'), (40, 40, 'RGB')],
+                         ids=['same-pixel-count', 'other-mode', 'larger-image'])
+def test_mismatched_plan_is_rejected(plan_args, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    image = Image.new('RGB', (20, 15))
+    plan = EmbeddingPlan(*plan_args)
+    with pytest.raises(ValueError, match='does not match'):
+        hide_message(image, 'hi', plan=plan)
+    with pytest.raises(ValueError, match='does not match'):
+        reveal_message(image, plan=plan)
+
+
+def test_embedding_plan_disk_cache(tmp_path, monkeypatch):
+    plan = EmbeddingPlan(20, 15, 'RGB')
+    plan.save(str(tmp_path))
+    path = EmbeddingPlan.cache_path(str(tmp_path), 20, 15, 'RGB')
+
+    loaded = EmbeddingPlan.load(str(tmp_path), 20, 15, 'RGB')
+    assert isinstance(loaded.indices, np.memmap)
+    assert (loaded.prime, loaded.primitive_root) == (plan.prime, plan.primitive_root)
+    assert np.array_equal(loaded.indices, plan.indices)
+    assert EmbeddingPlan.load(str(tmp_path), 16, 12, 'L') is None
+
+    # a stale file of the wrong length is rejected, get_embedding_plan rebuilds and rewrites it
+    np.save(path, plan.indices[:-1])
+    assert EmbeddingPlan.load(str(tmp_path), 20, 15, 'RGB') is None
+    cached = get_embedding_plan(20, 15, 'RGB', cache_dir=str(tmp_path))
+    assert np.array_equal(cached.indices, plan.indices)
+    assert get_embedding_plan(20, 15, 'RGB', cache_dir=str(tmp_path)) is cached
+    assert np.array_equal(EmbeddingPlan.load(str(tmp_path), 20, 15, 'RGB').indices, plan.indices)
+
+    # hide and reveal work from the memory mapped plan
+    monkeypatch.chdir(tmp_path)
+    hide_message(Image.new('RGB', (20, 15)), 'hi', plan=loaded)
+    with Image.open(tmp_path / 'STEGO_IMG.png') as stego_image:
+        assert reveal_message(stego_image, plan=loaded) == 'hi'